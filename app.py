@@ -1,12 +1,16 @@
 import streamlit as st
 import os
-import yaml
-import tempfile
 import main
+import bundle
+import bundle_store
+import generated_runtime
+import jobs
+import templates
+import lineage
+import lazy_modules
 import sys
-import io
-import shutil
-import hashlib
+import time
+import uuid
 
 # --- App Configuration ---
 st.set_page_config(
@@ -23,6 +27,9 @@ if 'app_state' not in st.session_state:
         "generated_code": None,
         "uploaded_file_name": None,
     }
+if 'session_id' not in st.session_state:
+    # Identifies this session's references in the shared bundle store
+    st.session_state.session_id = uuid.uuid4().hex
 
 # --- Helper Functions ---
 def switch_view(view_name):
@@ -30,6 +37,7 @@ def switch_view(view_name):
     # Clean up the sample folder if going back to the uploader
     if view_name == 'uploader':
         cleanup_sample_folder()
+        generated_runtime.reset(st.session_state)
     
     st.session_state.app_state['view'] = view_name
     # Only set should_rerun if not already set, to avoid double rerun
@@ -37,24 +45,142 @@ def switch_view(view_name):
         st.session_state['should_rerun'] = True
 
 def cleanup_sample_folder():
-    # Remove the extracted sample folder if it exists in session state
-    sample_folder = st.session_state.app_state.get('sample_folder_path')
-    if sample_folder and os.path.exists(sample_folder):
-        try:
-            shutil.rmtree(sample_folder)
-        except Exception as e:
-            print(f"Error deleting sample folder: {e}")
-        st.session_state.app_state['sample_folder_path'] = None
+    # Release this session's reference to the extracted bundle. The shared store
+    # keeps the folder for other sessions and deletes it once it gets evicted.
+    bundle_hash = st.session_state.app_state.get('uploaded_file_hash')
+    if bundle_hash:
+        bundle_store.store.release(bundle_hash, st.session_state.session_id)
+    st.session_state.app_state['sample_folder_path'] = None
+
+STAGE_LABELS = {
+    "extract": "\U0001F4CB Stage 1: Extracting task information",
+    "generate": "\U0001F528 Stage 2: Generating Streamlit application code",
+    "review": "\U0001F50D Stage 3: Reviewing and fixing generated code",
+}
+
+def render_job_progress(job):
+    """Render the progress of a background generation job from its snapshot"""
+    stages = job["stages"]
+    finished = sum(1 for info in stages.values() if info.get("status") in ('done', 'cached', 'skipped'))
+    # An incremental run that falls back to the full pipeline reports some stages twice
+    fraction = min(1.0, finished / len(STAGE_LABELS))
+    current = STAGE_LABELS.get(job["current_stage"], "Starting pipeline")
+    if job["status"] == 'queued':
+        st.progress(0.0, text="⏳ Waiting for a free generation worker...")
+    else:
+        st.progress(fraction, text=f"{current}...")
+    for stage, label in STAGE_LABELS.items():
+        info = stages.get(stage, {})
+        status = info.get("status")
+        if status == 'running':
+            ttft = info.get("ttft")
+            note = f" (first token after {ttft:.2f}s)" if ttft is not None else ""
+            st.markdown(f"⏳ {label}...{note}")
+        elif status == 'cached':
+            st.markdown(f"♻️ {label} (cached)")
+        elif status == 'done':
+            ttft = info.get("ttft")
+            note = f", first token after {ttft:.2f}s" if ttft is not None else ""
+            usage = info.get("usage") or {}
+            if "prompt_tokens" in usage:
+                note += f", {usage['prompt_tokens']} → {usage['completion_tokens']} tokens"
+            st.markdown(f"✅ {label} ({info['elapsed']:.1f}s{note})")
+        elif status == 'failed':
+            st.markdown(f"❌ {label} failed: {info.get('error')}")
+        elif status == 'skipped':
+            st.markdown(f"⏭️ {label} (skipped: {info.get('reason')})")
+        else:
+            st.markdown(f"▫️ {label}")
+    if job["text"]:
+        st.code(job["text"], language='python')
+
+def render_trace_panel(trace):
+    """Sidebar panel with the tracing data of the last generation"""
+    with st.sidebar.expander("📊 Generation metrics"):
+        totals = trace.get("totals", {})
+        st.markdown(f"**Total:** {trace.get('wall_time', 0):.1f}s, status `{trace.get('status')}`")
+        st.markdown(f"**LLM calls:** {totals.get('llm_calls', 0)} "
+                    f"(cache hits: {totals.get('cache_hits', 0)}, retries: {totals.get('retries', 0)})")
+        st.markdown(f"**Tokens:** {totals.get('prompt_tokens', 0)} prompt / {totals.get('completion_tokens', 0)} completion, "
+                    f"est. ${totals.get('cost_usd', 0):.4f}")
+        st.markdown(f"**Review outcome:** {trace.get('review_outcome') or 'n/a'}")
+        template = trace.get("template")
+        if template:
+            st.markdown(f"**Template:** `{template['signature']}` ({template['mode']})")
+        incremental = trace.get("incremental")
+        if incremental:
+            outcome = "fell back to full generation" if incremental.get("fallback") else "patched previous version"
+            st.markdown(f"**Incremental:** {incremental['changes']} task.yaml change(s) in "
+                        f"{', '.join(incremental['sections']) or 'no section'}, {outcome}")
+        for name, stage in trace.get("stages", {}).items():
+            st.markdown(f"- `{name}`: {stage['wall_time']:.2f}s")
+        for call in trace.get("llm_calls", []):
+            if call["cached"]:
+                st.markdown(f"- ♻️ `{call['stage']}` cache hit")
+            else:
+                ttft = f", ttft {call['ttft']:.2f}s" if call.get("ttft") is not None else ""
+                st.markdown(f"- 🤖 `{call['stage']}` {call['wall_time']:.2f}s{ttft}, "
+                            f"{call.get('prompt_tokens', 0)}→{call.get('completion_tokens', 0)} tokens")
+
+def approve_template():
+    """Store the running app in the template library for tasks of the same shape"""
+    task_yaml = main.read_task_yaml(st.session_state.app_state['task_yaml_path'])
+    signature = templates.approve(task_yaml, st.session_state.app_state['generated_code'],
+                                  source=st.session_state.app_state.get('uploaded_file_name'))
+    st.session_state.app_state['approved_template'] = signature
+
+def extraction_failed():
+    """Report a failed background extraction of this session's bundle; True if it failed.
+
+    The broken extraction is dropped from the shared store, so the uploader
+    extracts the bundle again instead of reusing a partial dataset.
+    """
+    extract_dir = st.session_state.app_state.get('extract_dir')
+    error = bundle.extraction_error(extract_dir) if extract_dir else None
+    if error is None:
+        return False
+    bundle_store.store.discard(st.session_state.app_state.get('uploaded_file_hash'))
+    st.session_state.app_state['sample_folder_path'] = None
+    st.session_state.app_state['upload_digest'] = (None, None)
+    st.error(f"❌ Extracting the dataset failed ({error}); the bundle will be extracted again.")
+    return True
 
-def get_file_hash(uploaded_file):
-    # Compute a hash of the uploaded file's content
-    uploaded_file.seek(0)
-    file_bytes = uploaded_file.read()
-    uploaded_file.seek(0)
-    return hashlib.sha256(file_bytes).hexdigest()
+def current_index():
+    """Dataset index of this session's bundle, looked up in the shared store"""
+    entry = bundle_store.store.get(st.session_state.app_state.get('uploaded_file_hash'))
+    return entry['index'] if entry is not None else None
+
+def render_storage_panel():
+    """Sidebar panel with the shared storage and job usage"""
+    usage = bundle_store.store.usage(st.session_state.session_id)
+    job_usage = jobs.executor.usage()
+    gb = 1024 ** 3
+    with st.sidebar.expander("💾 Storage"):
+        st.markdown(f"**Bundle store:** {usage['bytes'] / gb:.2f} / {usage['max_bytes'] / gb:.1f} GB, "
+                    f"{usage['entries']} bundles ({usage['referenced']} in use by {usage['sessions']} sessions)")
+        st.markdown(f"**This session:** {usage['session_bytes'] / gb:.2f} / {usage['session_quota'] / gb:.1f} GB")
+        reaped = usage['reaped']
+        st.markdown(f"**Reaped:** {reaped['sessions']} idle sessions, {reaped['evicted']} evicted bundles, "
+                    f"{reaped['orphans']} orphaned files ({reaped['orphan_bytes'] / gb:.2f} GB)")
+        st.markdown(f"**Generation jobs:** {job_usage['running']} running, {job_usage['queued']} queued")
 
 # --- Main App Logic ---
 
+# Keep this session's bundle reference alive; when the reaper already dropped it
+# (the session was idle too long), the uploader extracts the bundle again
+if st.session_state.app_state.get('uploaded_file_hash'):
+    if not bundle_store.store.touch(st.session_state.app_state['uploaded_file_hash'], st.session_state.session_id):
+        st.session_state.app_state['sample_folder_path'] = None
+        if st.session_state.app_state['view'] == 'generated_app':
+            # The generated app would read a folder that may already be evicted, and
+            # the uploader lost the file while it was not rendered: start over there
+            st.session_state.app_state['uploaded_file_hash'] = None
+            st.session_state.app_state['view'] = 'uploader'
+            generated_runtime.reset(st.session_state)
+            st.warning("⚠️ This session was idle for too long and its dataset was released; "
+                       "please upload the bundle again.")
+render_storage_panel()
+
 # Use the 'view' from state to decide what to render
 current_view = st.session_state.app_state['view']
 
@@ -83,80 +209,62 @@ if current_view == "uploader":
             help="Upload a single .zip file containing task.yaml, dataset, and any required files."
         )
         extract_dir = None
-        extracted_files = []
+        file_count = 0
         task_yaml_path = None
-        task_yaml = None
         abs_task_yaml_path = None
         abs_paths_info = {}
         current_file_hash = None
         if task_bundle_zip is not None:
-            current_file_hash = get_file_hash(task_bundle_zip)
+            # Hash and spool the upload to disk in one chunked pass, but only once per
+            # upload: Streamlit keeps the same file_id across reruns
+            upload_id = getattr(task_bundle_zip, 'file_id', None)
+            prev_upload_id, prev_upload_hash = st.session_state.app_state.get('upload_digest', (None, None))
             prev_file_hash = st.session_state.app_state.get('uploaded_file_hash')
             prev_sample_folder = st.session_state.app_state.get('sample_folder_path')
+            tmp_zip_path = None
+            if upload_id is not None and upload_id == prev_upload_id:
+                current_file_hash = prev_upload_hash
+            else:
+                current_file_hash, tmp_zip_path = bundle.spool_upload(task_bundle_zip)
+                st.session_state.app_state['upload_digest'] = (upload_id, current_file_hash)
             # Only extract if the file is new or no folder exists
             if current_file_hash != prev_file_hash or not prev_sample_folder or not os.path.exists(prev_sample_folder):
                 # Clean up previous folder if exists
                 cleanup_sample_folder()
-                import zipfile
-                import tempfile
-                import yaml as pyyaml
-                import shutil
-                import re
-                # Extract zip to a temp directory
-                extract_dir = tempfile.mkdtemp(prefix="task_bundle_")
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_zip:
-                    tmp_zip.write(task_bundle_zip.read())
-                    tmp_zip_path = tmp_zip.name
-                with zipfile.ZipFile(tmp_zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(extract_dir)
-                    extracted_files = zip_ref.namelist()
-                os.unlink(tmp_zip_path)
-                # Find task.yaml in extracted files
-                for f in extracted_files:
-                    if re.match(r'.*task\.ya?ml$', f):
-                        task_yaml_path = os.path.join(extract_dir, f)
-                        break
-                if task_yaml_path and os.path.exists(task_yaml_path):
-                    with open(task_yaml_path, 'r', encoding='utf-8') as f:
-                        task_yaml = pyyaml.safe_load(f)
-                    # Always set the absolute path to the parent directory of task_yaml_path
-                    sample_folder = os.path.abspath(os.path.dirname(task_yaml_path))
-                    st.session_state.app_state['sample_folder_path'] = sample_folder
-                    dataset_desc = task_yaml.get('dataset_description', {})
-                    updated = False
-                    abs_paths_info = {} # Reset to ensure it's clean for this run
-                    for key in ['data_path', 'data_source']:
-                        if key in dataset_desc:
-                            # This is the absolute path to the sample folder
-                            abs_path = sample_folder
-                            # Update the YAML for the LLM
-                            dataset_desc[key] = abs_path
-                            # Use a clear key for UI display
-                            abs_paths_info['absolute_path'] = abs_path
-                            updated = True
-                    if updated:
-                        # Write a new task.yaml with updated paths
-                        abs_task_yaml_path = os.path.join(extract_dir, 'task_abs.yaml')
-                        with open(abs_task_yaml_path, 'w', encoding='utf-8') as f:
-                            pyyaml.dump(task_yaml, f, allow_unicode=True)
-                        st.session_state.app_state['task_yaml_path'] = abs_task_yaml_path
-                    else:
-                        # No dataset path found, use original
-                        st.session_state.app_state['task_yaml_path'] = task_yaml_path
-                    st.session_state.app_state['task_yaml'] = task_yaml
+                if tmp_zip_path is None:
+                    _, tmp_zip_path = bundle.spool_upload(task_bundle_zip)
+                # Reuse the shared extraction if any session already uploaded these bytes
+                try:
+                    entry = bundle_store.store.acquire(current_file_hash, st.session_state.session_id, tmp_zip_path)
+                except bundle_store.QuotaError as e:
+                    # Forget the digest so the next rerun tries again (e.g. once space is freed)
+                    st.session_state.app_state['upload_digest'] = (None, None)
+                    st.error(f"❌ {e}")
+                    st.stop()
+                if entry is not None:
+                    # Only small values live in the session; the file list and the
+                    # dataset index stay in the shared store entry
+                    extract_dir = entry['dir']
+                    file_count = entry['files']
+                    task_yaml_path = entry['task_yaml_path']
+                    abs_paths_info = entry['abs_paths_info']
+                    st.session_state.app_state['sample_folder_path'] = entry['sample_folder']
+                    st.session_state.app_state['task_yaml_path'] = entry['generation_yaml_path']
                     st.session_state.app_state['extract_dir'] = extract_dir
-                    st.session_state.app_state['extracted_files'] = extracted_files
+                    st.session_state.app_state['extracted_file_count'] = file_count
                     st.session_state.app_state['abs_paths_info'] = abs_paths_info
                     st.session_state.app_state['uploaded_file_hash'] = current_file_hash
+                    st.session_state.app_state['uploaded_file_name'] = task_bundle_zip.name
                 else:
                     st.error("No task.yaml found in the uploaded zip. Please include it at the correct location.")
             else:
                 # Reuse previous extraction
+                if tmp_zip_path:
+                    os.unlink(tmp_zip_path)
                 extract_dir = prev_sample_folder
                 task_yaml_path = st.session_state.app_state.get('task_yaml_path')
-                task_yaml = st.session_state.app_state.get('task_yaml')
                 abs_task_yaml_path = st.session_state.app_state.get('task_yaml_path')
-                extracted_files = st.session_state.app_state.get('extracted_files', [])
+                file_count = st.session_state.app_state.get('extracted_file_count', 0)
                 abs_paths_info = st.session_state.app_state.get('abs_paths_info', {})
 
     with col2:
@@ -165,12 +273,21 @@ if current_view == "uploader":
         st.markdown("**Bundle Contents**")
         if extract_dir:
             st.markdown(f"• Extracted to: `{extract_dir}`")
-            if extracted_files:
+            if not extraction_failed() and not bundle.extraction_done(st.session_state.app_state.get('extract_dir')):
+                st.markdown("• ⏳ Dataset files are still being extracted in the background")
+            index = current_index()
+            if index is not None:
+                classes = index.groupings()
+                grouping = ", ".join(f"`{k or '.'}`: {len(v)} subfolders" for k, v in list(classes.items())[:3])
+                st.markdown(f"**Dataset index:** {len(index)} files, {index.total_size / 1024 / 1024:.1f} MB"
+                            + (f" ({grouping})" if grouping else ""))
+            if index is not None and file_count:
+                # Only the first entries are materialized from the index
                 st.markdown("**Extracted Files:**")
-                for f in extracted_files[:10]:
+                for f in index.files(limit=10, absolute=False):
                     st.markdown(f"- {f}")
-                if len(extracted_files) > 10:
-                    st.markdown(f"...and {len(extracted_files)-10} more files.")
+                if file_count > 10:
+                    st.markdown(f"...and {file_count-10} more files.")
             if task_yaml_path:
                 st.markdown(f"**Detected task.yaml:** `{task_yaml_path}`")
             if abs_paths_info:
@@ -184,17 +301,67 @@ if current_view == "uploader":
 
     if 'task_yaml_path' in st.session_state.app_state and st.session_state.app_state['task_yaml_path']:
         st.subheader("\U0001F680 Ready to Generate UI Code")
-        if st.button("\u2728 Generate UI", type="primary", use_container_width=True):
-            with st.spinner("Generating UI Code... This may take a moment."):
-                try:
-                    # Use the extracted (and possibly updated) task.yaml for code generation
-                    generated_code_string = main.main(st.session_state.app_state['task_yaml_path'])
-                    # Store the generated code in session state
-                    st.session_state.app_state['generated_code'] = generated_code_string
-                    # Switch to the 'generated_app' view
-                    switch_view('generated_app')
-                except Exception as e:
-                    st.error(f"❌ An error occurred during generation: {e}")
+        job_id = st.session_state.app_state.get('job_id')
+        job = jobs.executor.get(job_id) if job_id else None
+        from_scratch = st.checkbox(
+            "\U0001F504 Regenerate from scratch",
+            help="Ignore this session's previous app, cached LLM replies and approved templates")
+        if st.button("\u2728 Generate UI", type="primary", use_container_width=True,
+                     disabled=job is not None and job.active):
+            # Use the extracted (and possibly updated) task.yaml for code generation
+            # Re-uploads of the same bundle name in this session only regenerate
+            # what their task.yaml changes affect; lineages are never shared
+            # between sessions
+            bundle_hash = st.session_state.app_state.get('uploaded_file_hash')
+            task_yaml_path = st.session_state.app_state['task_yaml_path']
+            lineage_name = f"{st.session_state.session_id}:{st.session_state.app_state.get('uploaded_file_name')}"
+            index = current_index()
+            # The pipeline runs on a background worker; sessions generating the
+            # same bundle at the same time share one job. Only fresh generations
+            # are shared: a run patching this session's previous app, or a
+            # from-scratch run, gets a job of its own
+            if from_scratch:
+                key = (bundle_hash, 'scratch')
+            elif lineage.load(lineage_name) is not None:
+                key = (bundle_hash, lineage_name)
+            else:
+                key = bundle_hash
+            job = jobs.executor.submit(
+                key, main.main, task_yaml_path,
+                use_cache=not from_scratch,
+                lineage_name=None if from_scratch else lineage_name,
+                dataset_summary=index.summary() if index is not None and len(index) else None,
+                template_mode='off' if from_scratch else None,
+                # A shared job saves its result under the lineage of the session
+                # that started it; every joining session records it under its own
+                on_done=None if from_scratch else (
+                    lambda code, name=lineage_name, path=task_yaml_path:
+                        lineage.adopt(name, main.read_task_yaml(path), code)),
+            )
+            st.session_state.app_state['job_id'] = job.id
+        if job is not None:
+            snapshot = job.snapshot()
+            if snapshot["status"] == 'done':
+                st.session_state.app_state['job_id'] = None
+                # Kept for the metrics panel in the generated app's sidebar
+                st.session_state.app_state['last_trace'] = snapshot["trace"]
+                # Store the generated code in session state
+                st.session_state.app_state['generated_code'] = snapshot["result"]
+                st.session_state.app_state['approved_template'] = None
+                # Switch to the 'generated_app' view
+                switch_view('generated_app')
+            elif snapshot["status"] == 'failed':
+                st.session_state.app_state['job_id'] = None
+                render_job_progress(snapshot)
+                st.error(f"❌ An error occurred during generation: {snapshot['error']}")
+            else:
+                render_job_progress(snapshot)
+                # Poll the background job; the work survives reruns of this script
+                time.sleep(0.5)
+                st.rerun()
+        elif job_id:
+            # The job finished long ago and was forgotten
+            st.session_state.app_state['job_id'] = None
     else:
         st.info("\U0001F4C1 Please upload a valid task bundle zip to continue")
 
@@ -206,34 +373,43 @@ elif current_view == "generated_app":
     st.sidebar.markdown("---")
     
     generated_code = st.session_state.app_state.get('generated_code')
-    
+    extract_dir = st.session_state.app_state.get('extract_dir')
+    if extract_dir and not bundle.extraction_done(extract_dir):
+        with st.spinner("Finishing dataset extraction..."):
+            try:
+                bundle.wait_for_extraction(extract_dir)
+            except Exception:
+                # Reported (and cleaned up) by extraction_failed() below
+                pass
+    if extraction_failed():
+        st.button("Go back to uploader", on_click=switch_view, args=('uploader',))
+        st.stop()
+
     if generated_code:
         st.sidebar.subheader("📄 Generated Code")
         with st.sidebar.expander("Click to view the code running this page"):
             st.code(generated_code, language='python')
         
         try:
-            # Prepare a namespace for execution.
-            # We pass a dictionary of modules that the generated code might need.
-            namespace = {
-                "st": st,
-                "os": os,
-                "yaml": yaml,
-                "tempfile": tempfile,
-                # Add any other modules the LLM is likely to use
-                "pandas": __import__("pandas"),
-                "numpy": __import__("numpy"),
-                "requests": __import__("requests"),
-                "io": io,
-                "PIL": __import__("PIL"),
-                "librosa": __import__("librosa"),
-            }
-            # Execute the generated code within the prepared namespace
-            exec(generated_code, namespace)
-            # If a main() function is defined, call it to ensure UI is rendered
-            if 'main' in namespace and callable(namespace['main']):
-                namespace['main']()
-            
+            # Compiled once per code hash; module-level setup is kept across reruns
+            elapsed, first_run = generated_runtime.run_generated(
+                generated_code, st.session_state, extra={"dataset_index": current_index()})
+            run_kind = "full module run" if first_run else "render only, cached module"
+            st.sidebar.caption(f"⏱️ Generated app run: {elapsed * 1000:.1f} ms ({run_kind})")
+            if st.session_state.app_state.get('last_trace'):
+                render_trace_panel(st.session_state.app_state['last_trace'])
+            # Only offered once the app has rendered without errors
+            st.sidebar.button("⭐ Approve as template", on_click=approve_template,
+                              help="Reuse this app for future bundles with the same input keys and output type")
+            if st.session_state.app_state.get('approved_template'):
+                st.sidebar.caption(f"📚 Stored as template `{st.session_state.app_state['approved_template']}`")
+            with st.sidebar.expander("🐢 Module import times"):
+                report = lazy_modules.import_report()
+                if report:
+                    for name, seconds in report:
+                        st.markdown(f"- `{name}`: {seconds * 1000:.0f} ms")
+                else:
+                    st.markdown("No heavy modules loaded yet.")
         except Exception as e:
             st.error(f"❌ An error occurred while running the generated code: {e}")
             st.code(generated_code, language='python')
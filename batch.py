@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import bundle
+import dataset_index
+import file_store
+import lineage
+import main
+import rate_limit
+
+# Batch front-end for main.main: regenerates the UI of many task bundles (folders
+# or .zip files) with a bounded worker pool, a shared client-side rate limiter and
+# a JSON manifest that records the outcome and timings of every bundle.
+#
+# Zip bundles are extracted into <BATCH_EXTRACT_DIR>/<sha256 of the zip> and kept
+# there, so the absolute data_path written into their task.yaml (and with it the
+# LLM stage cache keys) stays the same from one run to the next.
+BATCH_EXTRACT_DIR = os.getenv("BATCH_EXTRACT_DIR", os.path.join(tempfile.gettempdir(), "batch_bundle_store"))
+
+
+def pipeline_fingerprint():
+    """Hash of the pipeline sources; outputs made by a different version are stale"""
+    return lineage.pipeline_fingerprint()
+
+
+def is_bundle(path):
+    """A bundle is a .zip file or a folder that directly contains a task.yaml"""
+    if os.path.isfile(path):
+        return path.lower().endswith('.zip')
+    if os.path.isdir(path):
+        return bundle.find_task_yaml(os.listdir(path)) is not None
+    return False
+
+
+def discover_bundles(paths):
+    """Expand the CLI arguments into a sorted list of bundle paths"""
+    found = []
+    for path in paths:
+        if is_bundle(path):
+            found.append(os.path.abspath(path))
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                child = os.path.join(path, name)
+                if is_bundle(child):
+                    found.append(os.path.abspath(child))
+        else:
+            print(f"⚠️ Skipping {path}: not a task bundle")
+    return sorted(set(found))
+
+
+def bundle_name(bundle_path):
+    """Output name of a bundle: its base name plus a hash of its absolute path.
+
+    The suffix keeps a/foo.zip and b/foo/ from writing the same file.
+    """
+    name = os.path.basename(bundle_path.rstrip(os.sep))
+    name = name[:-4] if name.lower().endswith('.zip') else name
+    suffix = hashlib.sha256(os.path.abspath(bundle_path).encode('utf-8')).hexdigest()[:8]
+    return f"{name}-{suffix}"
+
+
+def extract_zip(zip_path):
+    """Extract a zip bundle into its content-addressed folder (once) and return the folder"""
+    extract_dir = os.path.join(BATCH_EXTRACT_DIR, bundle.file_digest(zip_path))
+    if os.path.isdir(extract_dir):
+        return extract_dir
+    os.makedirs(BATCH_EXTRACT_DIR, exist_ok=True)
+    # Extract next to the target and rename, so a crashed run or a worker handling
+    # an identical zip never sees a half-written folder
+    tmp_dir = tempfile.mkdtemp(dir=BATCH_EXTRACT_DIR, prefix=os.path.basename(extract_dir) + '.')
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(tmp_dir)
+        os.rename(tmp_dir, extract_dir)
+    except OSError:
+        if not os.path.isdir(extract_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return extract_dir
+
+
+def bundle_mtime(bundle_path):
+    """Modification time of what the generation depends on (the zip or the folder's task.yaml)"""
+    if os.path.isfile(bundle_path):
+        return os.path.getmtime(bundle_path)
+    task_yaml_name = bundle.find_task_yaml(os.listdir(bundle_path))
+    return os.path.getmtime(os.path.join(bundle_path, task_yaml_name))
+
+
+def is_up_to_date(bundle_path, output_path, previous, fingerprint):
+    """True when output_path was produced successfully from the current bundle and pipeline"""
+    if not previous or previous.get('status') != 'ok' or previous.get('pipeline') != fingerprint:
+        return False
+    if not os.path.exists(output_path):
+        return False
+    return os.path.getmtime(output_path) >= bundle_mtime(bundle_path)
+
+
+def generate_bundle(bundle_path, output_path, use_cache=True, incremental=True):
+    """Run main.main for one bundle and write its app; returns the manifest record"""
+    record = {"bundle": bundle_path, "output": output_path, "stages": {}}
+    stage_start = {}
+
+    def on_progress(stage, event, data):
+        if event == 'start':
+            stage_start[stage] = time.perf_counter()
+        elif event == 'cached':
+            record["stages"][stage] = {"cached": True, "elapsed": time.perf_counter() - stage_start[stage]}
+        elif event == 'done':
+            record["stages"][stage] = {"cached": False, "elapsed": data["elapsed"], "ttft": data["ttft"],
+                                       "usage": data.get("usage")}
+        elif event == 'skipped':
+            record["stages"][stage] = {"skipped": data}
+        elif event == 'trace':
+            record["trace_id"] = data["trace_id"]
+            record["totals"] = data.get("totals")
+
+    start = time.perf_counter()
+    # Scratch space for the rewritten task_abs.yaml, so bundles are never modified in place
+    work_dir = tempfile.mkdtemp(prefix="task_bundle_")
+    try:
+        if os.path.isfile(bundle_path):
+            names, _ = bundle.list_zip(bundle_path)
+            extract_dir = extract_zip(bundle_path)
+        else:
+            names = os.listdir(bundle_path)
+            extract_dir = bundle_path
+        task_yaml_name = bundle.find_task_yaml(names)
+        if task_yaml_name is None:
+            raise FileNotFoundError("no task.yaml in bundle")
+        _, task_yaml_path, _, sample_folder = bundle.prepare_task_yaml(os.path.join(extract_dir, task_yaml_name), work_dir)
+        index = dataset_index.DatasetIndex.from_folder(sample_folder)
+        lineage_name = os.path.abspath(bundle_path) if incremental and use_cache else None
+        code = main.main(task_yaml_path, use_cache=use_cache, progress=on_progress, lineage_name=lineage_name,
+                         dataset_summary=index.summary() if len(index) else None)
+        if code is None:
+            raise RuntimeError("pipeline returned no code")
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        record["status"] = 'ok'
+    except Exception as e:
+        record["status"] = 'error'
+        record["error"] = str(e)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"bundles": {}}
+
+
+def write_manifest(path, manifest):
+    file_store.write_json(path, manifest, indent=2)
+
+
+def run_batch(paths, out_dir='generated', workers=4, requests_per_minute=None, tokens_per_minute=None,
+              resume=False, manifest_path=None, use_cache=True, incremental=True):
+    """Generate every bundle under paths concurrently; returns the manifest dict"""
+    bundles = discover_bundles(paths)
+    manifest_path = manifest_path or os.path.join(out_dir, 'manifest.json')
+    manifest = load_manifest(manifest_path) if resume else {"bundles": {}}
+    fingerprint = pipeline_fingerprint()
+    manifest["pipeline"] = fingerprint
+    os.makedirs(out_dir, exist_ok=True)
+
+    if requests_per_minute or tokens_per_minute:
+        main.rate_limiter = rate_limit.RateLimiter(requests_per_minute, tokens_per_minute)
+
+    todo = []
+    for bundle_path in bundles:
+        output_path = os.path.join(out_dir, f"{bundle_name(bundle_path)}.py")
+        previous = manifest["bundles"].get(bundle_path)
+        if resume and is_up_to_date(bundle_path, output_path, previous, fingerprint):
+            print(f"⏭️ Up to date: {bundle_path}")
+            continue
+        todo.append((bundle_path, output_path))
+    print(f"🚀 Generating {len(todo)} of {len(bundles)} bundles with {workers} workers")
+
+    batch_start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(generate_bundle, b, o, use_cache, incremental): b for b, o in todo}
+            for future in as_completed(futures):
+                record = future.result()
+                record["pipeline"] = fingerprint
+                record["finished_at"] = time.time()
+                manifest["bundles"][futures[future]] = record
+                # Rewrite after every bundle so an interrupted run can be resumed
+                write_manifest(manifest_path, manifest)
+                icon = "✅" if record["status"] == 'ok' else "❌"
+                print(f"{icon} {record['bundle']} ({record['elapsed']:.1f}s)")
+    finally:
+        main.rate_limiter = None
+
+    manifest["elapsed"] = time.perf_counter() - batch_start
+    write_manifest(manifest_path, manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Streamlit UIs for many task bundles")
+    parser.add_argument('bundles', nargs='+', help="Bundle folders/zips, or directories containing them")
+    parser.add_argument('-o', '--out-dir', default='generated', help="Directory for generated apps")
+    parser.add_argument('-j', '--workers', type=int, default=4, help="Number of concurrent pipelines")
+    parser.add_argument('--rpm', type=int, default=None, help="Max LLM requests per minute")
+    parser.add_argument('--tpm', type=int, default=None, help="Max LLM tokens per minute")
+    parser.add_argument('--resume', action='store_true', help="Skip bundles whose outputs are up to date")
+    parser.add_argument('--manifest', default=None, help="Manifest path (default: <out-dir>/manifest.json)")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not update the LLM stage cache")
+    parser.add_argument('--full', action='store_true', help="Regenerate from scratch instead of patching previous apps")
+    args = parser.parse_args()
+    result = run_batch(args.bundles, args.out_dir, args.workers, args.rpm, args.tpm,
+                       args.resume, args.manifest, not args.no_cache, not args.full)
+    failed = [r for r in result["bundles"].values() if r.get("status") != 'ok']
+    raise SystemExit(1 if failed else 0)
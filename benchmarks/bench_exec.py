@@ -0,0 +1,53 @@
+import logging
+import statistics
+import time
+
+from benchmarks.fake_openai_server import GENERATED_APP_REPLY
+
+# Per-rerun cost of running a generated app: a plain compile + exec of the whole
+# script (what every rerun used to do) against generated_runtime's cached path.
+
+HELPER_TEMPLATE = '''
+
+@st.cache_data
+def helper_{i}(values):
+    """Synthetic helper to give the module a realistic size"""
+    total = 0
+    for value in values:
+        if isinstance(value, (int, float)):
+            total += value * {i}
+    return pd.DataFrame({{"total": [total], "index": [{i}]}})
+'''
+
+
+def synthetic_app(helpers=100):
+    """A generated-looking app with `helpers` extra module-level functions"""
+    head, tail = GENERATED_APP_REPLY.split("\n\ndef main():", 1)
+    body = "".join(HELPER_TEMPLATE.format(i=i) for i in range(helpers))
+    return head + body + "\n\ndef main():" + tail
+
+
+def run(reruns=50, helpers=100):
+    """Benchmark exec overhead; returns a flat {metric: value} dict"""
+    # Outside a script run context Streamlit logs a warning for every call
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import generated_runtime
+
+    code = synthetic_app(helpers)
+    naive = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        namespace = generated_runtime.build_namespace()
+        exec(compile(code, "<generated_app>", 'exec'), namespace)
+        namespace['main']()
+        naive.append(time.perf_counter() - start)
+
+    session = {}
+    first_run, _ = generated_runtime.run_generated(code, session)
+    cached = [generated_runtime.run_generated(code, session)[0] for _ in range(reruns)]
+    return {
+        "exec.naive_rerun_ms": statistics.median(naive) * 1000,
+        "exec.first_run_ms": first_run * 1000,
+        "exec.cached_rerun_ms": statistics.median(cached) * 1000,
+        "exec.code_lines": code.count("\n") + 1,
+    }
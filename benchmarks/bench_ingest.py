@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import bundle
+
+# Ingest path of app.py: hashing/spooling the upload, reading the central
+# directory, and extracting, for synthetic zips of various sizes and entry counts.
+
+MB = 1024 * 1024
+GB = 1024 * MB
+# (total_bytes, entries) pairs: a size sweep at 100 entries and an entry-count sweep at 100 MB
+QUICK_CASES = [(10 * MB, 100), (100 * MB, 100), (100 * MB, 10), (100 * MB, 10_000)]
+FULL_CASES = QUICK_CASES + [(1 * GB, 100), (5 * GB, 100), (100 * MB, 100_000), (100 * MB, 1_000_000)]
+
+TASK_YAML = "model_information:\n  api_url: http://127.0.0.1:9/predict\ndataset_description:\n  data_path: ./data\n"
+
+
+def case_label(total_bytes, entries):
+    size = f"{total_bytes // GB}GB" if total_bytes >= GB else f"{total_bytes // MB}MB"
+    return f"{size}_{entries}files"
+
+
+def make_zip(path, total_bytes, entries, classes=10):
+    """Write a stored (uncompressed) zip with task.yaml and `entries` data files"""
+    block = os.urandom(MB)
+    per_file = max(1, total_bytes // entries)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+        zf.writestr("task.yaml", TASK_YAML)
+        for i in range(entries):
+            name = f"data/class_{i % classes}/sample_{i}.bin"
+            with zf.open(name, 'w', force_zip64=per_file > 2 * GB) as out:
+                remaining = per_file
+                while remaining > 0:
+                    chunk = block[:min(remaining, len(block))]
+                    out.write(chunk)
+                    remaining -= len(chunk)
+
+
+def bench_case(total_bytes, entries, work_dir):
+    zip_path = os.path.join(work_dir, "bundle.zip")
+    make_zip(zip_path, total_bytes, entries)
+    label = case_label(total_bytes, entries)
+    results = {}
+    try:
+        start = time.perf_counter()
+        with open(zip_path, 'rb') as f:
+            _, spooled = bundle.spool_upload(f)
+        elapsed = time.perf_counter() - start
+        results[f"ingest.{label}.hash_spool_s"] = elapsed
+        results[f"ingest.{label}.hash_spool_mb_per_s"] = total_bytes / MB / elapsed
+
+        start = time.perf_counter()
+        _, task_yaml_name = bundle.zip_sizes(spooled)
+        results[f"ingest.{label}.central_directory_s"] = time.perf_counter() - start
+
+        extract_dir = os.path.join(work_dir, "extracted")
+        start = time.perf_counter()
+        bundle.extract_members(spooled, extract_dir, [task_yaml_name])
+        results[f"ingest.{label}.task_yaml_ready_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bundle.start_background_extraction(spooled, extract_dir, skip=[task_yaml_name])
+        bundle.wait_for_extraction(extract_dir)
+        results[f"ingest.{label}.full_extract_s"] = time.perf_counter() - start
+    finally:
+        for name in os.listdir(work_dir):
+            path = os.path.join(work_dir, name)
+            shutil.rmtree(path, ignore_errors=True) if os.path.isdir(path) else os.unlink(path)
+    return results
+
+
+def run(full=False, work_dir=None):
+    """Benchmark the ingest path; returns a flat {metric: value} dict"""
+    work_dir = tempfile.mkdtemp(prefix="bench_ingest_", dir=work_dir)
+    results = {}
+    try:
+        for total_bytes, entries in (FULL_CASES if full else QUICK_CASES):
+            print(f"  ingest {case_label(total_bytes, entries)}...")
+            results.update(bench_case(total_bytes, entries, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
@@ -0,0 +1,94 @@
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from benchmarks.fake_openai_server import start_server
+
+# End-to-end main.main latency and concurrent throughput against the fake server.
+
+SYNTHETIC_TASK = {
+    "model_information": {
+        "api_url": "http://127.0.0.1:9/predict",
+        "input_format": {"structure": {"data": "base64 encoded image"}},
+        "output_format": {"type": "list of dict", "structure": {"label": "str", "score": "float"}},
+    },
+    "dataset_description": {
+        "data_path": "./data",
+        "classes": [f"class_{i}" for i in range(200)],
+        "description": "Synthetic benchmark task. " * 20,
+    },
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run(runs=5, concurrency=4, latency=0.2, tokens_per_second=200.0, failure_rate=0.0, review_mode='auto'):
+    """Benchmark main.main; returns a flat {metric: value} dict"""
+    server, base_url, config = start_server(latency=latency, tokens_per_second=tokens_per_second,
+                                            failure_rate=failure_rate, seed=0)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    import main
+    import tracing
+    from llm_client import LLMError
+    main.OPEN_API_KEY = main.OPEN_API_KEY or os.environ["OPENAI_API_KEY"]
+    # Make sure the shared client is created against the fake server
+    main._client = None
+    saved = (main.REVIEW_MODE, main.TEMPLATE_MODE, tracing.TRACE_PATH)
+    main.REVIEW_MODE = review_mode
+    # An approved template with the synthetic task's shape would skip every LLM call
+    main.TEMPLATE_MODE = 'off'
+    tracing.TRACE_PATH = None
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    task_yaml_path = os.path.join(work_dir, "task.yaml")
+    with open(task_yaml_path, 'w', encoding='utf-8') as f:
+        yaml.dump(SYNTHETIC_TASK, f)
+
+    def one_run(progress=None):
+        start = time.perf_counter()
+        try:
+            code = main.main(task_yaml_path, use_cache=False, progress=progress)
+        except LLMError:
+            # Exhausted retries (e.g. with a high failure_rate) count as a failed run
+            code = None
+        return time.perf_counter() - start, code is not None
+
+    try:
+        sequential = [one_run() for _ in range(runs)]
+        latencies = [elapsed for elapsed, _ in sequential]
+
+        ttfts = []
+        for _ in range(runs):
+            def on_progress(stage, event, data):
+                if stage == "generate" and event == 'first_token':
+                    ttfts.append(data)
+            one_run(on_progress)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            concurrent = list(pool.map(lambda _: one_run(), range(runs * concurrency)))
+        concurrent_wall = time.perf_counter() - start
+    finally:
+        main.REVIEW_MODE, main.TEMPLATE_MODE, tracing.TRACE_PATH = saved
+        main._client = None
+        server.shutdown()
+
+    results = {
+        "pipeline.latency_p50_s": statistics.median(latencies),
+        "pipeline.latency_p95_s": percentile(latencies, 0.95),
+        "pipeline.concurrent_throughput_runs_per_s": len(concurrent) / concurrent_wall,
+        "pipeline.failed_runs": sum(1 for _, ok in sequential + concurrent if not ok),
+        "pipeline.server_requests": config.requests,
+    }
+    if ttfts:
+        results["pipeline.stream_ttft_p50_s"] = statistics.median(ttfts)
+    return results
@@ -0,0 +1,199 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the OpenAI chat-completions endpoint, so pipeline benchmarks
+# run reproducibly without the real API. Point the client at it with
+# OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+#
+# Latency (time to first token), generation speed (tokens per second) and the
+# failure rate are configurable. Replies depend on the pipeline stage the prompt
+# belongs to: extraction prompts get a short summary, generation prompts a small
+# valid Streamlit app and review prompts "CODE_APPROVED".
+
+EXTRACTION_REPLY = """{
+  "core_functionality": {"task": "classification", "input": "file", "output": "labels"},
+  "api_integration": {"method": "POST", "payload_keys": ["data"]},
+  "ui_requirements": ["file uploader", "results table", "run on samples button"]
+}"""
+
+GENERATED_APP_REPLY = '''import os
+import requests
+import pandas as pd
+import streamlit as st
+
+API_URL = "http://127.0.0.1:9/predict"
+DATA_PATH = "."
+
+
+@st.cache_data
+def list_samples(path):
+    return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+
+def main():
+    st.title("Benchmark app")
+    uploaded = st.file_uploader("Upload a file")
+    if uploaded is not None:
+        st.write(uploaded.name)
+    samples = list_samples(DATA_PATH)
+    st.dataframe(pd.DataFrame({"sample": samples}))
+    if st.button("Run on samples"):
+        try:
+            response = requests.post(API_URL, json={"data": samples[:1]}, timeout=1)
+            st.json(response.json())
+        except Exception as e:
+            st.error(f"API call failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+
+class FakeServerConfig:
+    def __init__(self, latency=0.2, tokens_per_second=200.0, failure_rate=0.0, retry_after=None, seed=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+
+def reply_for(prompt):
+    if "GENERATED CODE:" in prompt or "Static analysis found problems" in prompt:
+        return "CODE_APPROVED"
+    if "Generate the complete Python code now" in prompt:
+        return GENERATED_APP_REPLY
+    return EXTRACTION_REPLY
+
+
+def split_tokens(text):
+    """Split text into pseudo tokens (about four characters each)"""
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with config.lock:
+                config.requests += 1
+                fail = config.random.random() < config.failure_rate
+                if fail:
+                    config.failures += 1
+            if fail:
+                status = 429 if config.retry_after is not None else 500
+                headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else {}
+                self._send_json(status, {"error": {"message": "injected failure", "type": "server_error"}}, headers)
+                return
+
+            prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+            text = reply_for(prompt)
+            tokens = split_tokens(text)
+            max_tokens = request.get("max_tokens")
+            finish_reason = "stop"
+            if max_tokens and len(tokens) > max_tokens:
+                tokens = tokens[:max_tokens]
+                finish_reason = "length"
+            usage = {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": len(tokens),
+                     "total_tokens": len(prompt) // 4 + 1 + len(tokens)}
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            time.sleep(config.latency)
+            if request.get("stream"):
+                self._stream(completion_id, request, tokens, finish_reason, usage)
+                return
+            if config.tokens_per_second:
+                time.sleep(len(tokens) / config.tokens_per_second)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": usage,
+            })
+
+        def _stream(self, completion_id, request, tokens, finish_reason, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+
+            def event(choices, extra=None):
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": request.get("model", "fake"), "choices": choices}
+                payload.update(extra or {})
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            for token in tokens:
+                event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+                if delay:
+                    time.sleep(delay)
+            event([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event([], {"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(host="127.0.0.1", port=0, **config_kwargs):
+    """Start the fake server on a background thread; returns (server, base_url, config)"""
+    config = FakeServerConfig(**config_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server, base_url, config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI chat-completions server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument('--tps', type=float, default=200.0, help="Generated tokens per second")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--retry-after', type=float, default=None, help="Fail with 429 + Retry-After instead of 500")
+    args = parser.parse_args()
+    server, base_url, _ = start_server(port=args.port, latency=args.latency, tokens_per_second=args.tps,
+                                       failure_rate=args.failure_rate, retry_after=args.retry_after)
+    print(f"Fake OpenAI server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
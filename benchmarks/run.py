@@ -0,0 +1,108 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+# Runs the benchmark suites and writes a JSON report that can be compared with a
+# previous one:
+#
+#   python -m benchmarks.run -o report.json
+#   python -m benchmarks.run --suite ingest --full --compare baseline.json
+#
+# Metric names ending in _s or _ms are durations (lower is better), names ending
+# in _per_s are rates (higher is better); anything else is informational.
+
+SUITES = ["pipeline", "ingest", "exec"]
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "commit": commit or None,
+        "timestamp": time.time(),
+    }
+
+
+def run_suites(suites, args):
+    results = {}
+    for suite in suites:
+        print(f"▶️ Running {suite} benchmarks...")
+        if suite == "pipeline":
+            from benchmarks import bench_pipeline
+            results.update(bench_pipeline.run(args.runs, args.concurrency, args.latency, args.tps,
+                                              args.failure_rate, args.review))
+        elif suite == "ingest":
+            from benchmarks import bench_ingest
+            results.update(bench_ingest.run(args.full))
+        elif suite == "exec":
+            from benchmarks import bench_exec
+            results.update(bench_exec.run())
+    return results
+
+
+def direction(metric):
+    """+1 if higher is better, -1 if lower is better, 0 if not comparable"""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_s") or metric.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(current, baseline, threshold):
+    """Print a comparison table; returns the metrics that regressed by more than threshold"""
+    regressions = []
+    for metric in sorted(current):
+        new = current[metric]
+        old = baseline.get(metric)
+        sign = direction(metric)
+        if old in (None, 0) or sign == 0:
+            print(f"  {metric:60s} {new:12.4f}")
+            continue
+        change = (new - old) / old
+        regressed = sign * change < -threshold
+        marker = "❌" if regressed else ("✅" if sign * change > threshold else "  ")
+        print(f"{marker}{metric:60s} {old:12.4f} -> {new:12.4f} ({change:+.1%})")
+        if regressed:
+            regressions.append(metric)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suites")
+    parser.add_argument('--suite', nargs='+', choices=SUITES, default=SUITES, help="Suites to run")
+    parser.add_argument('-o', '--output', default='bench_report.json', help="Where to write the JSON report")
+    parser.add_argument('--compare', default=None, help="Baseline report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative change that counts as a regression")
+    parser.add_argument('--full', action='store_true', help="Run the large ingest cases (up to 5 GB / 1M entries)")
+    parser.add_argument('--runs', type=int, default=5, help="Pipeline runs per measurement")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent pipelines for the throughput test")
+    parser.add_argument('--latency', type=float, default=0.2, help="Fake server time to first token (s)")
+    parser.add_argument('--tps', type=float, default=200.0, help="Fake server tokens per second")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fake server failure rate")
+    parser.add_argument('--review', default='auto', choices=['auto', 'always', 'never'], help="REVIEW_MODE to benchmark")
+    args = parser.parse_args()
+
+    report = {"meta": environment(), "config": vars(args), "results": run_suites(args.suite, args)}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline.get("results", {}), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            raise SystemExit(1)
+    else:
+        for metric, value in sorted(report["results"].items()):
+            print(f"  {metric:60s} {value:12.4f}")
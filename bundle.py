@@ -0,0 +1,182 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+
+# Helpers shared by the Streamlit uploader and the batch CLI for ingesting task
+# bundles and turning them into a task.yaml that main.main can consume.
+TASK_YAML_PATTERN = re.compile(r'.*task\.ya?ml$')
+DATASET_PATH_KEYS = ['data_path', 'data_source']
+# Uploads are hashed and spooled to disk in chunks of this size, so memory use
+# stays bounded no matter how large the bundle is
+CHUNK_SIZE = 1024 * 1024
+# Name prefix of spooled uploads in the temp dir (the bundle store reaps old ones)
+UPLOAD_PREFIX = "task_upload_"
+
+# Background extractions keyed by destination folder: {dest: (future, cancel_event)}
+_extract_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bundle_extract")
+_extractions = {}
+_extractions_lock = threading.Lock()
+
+
+def find_task_yaml(names):
+    """Return the first entry of names that looks like a task.yaml, or None"""
+    for name in names:
+        if TASK_YAML_PATTERN.match(name):
+            return name
+    return None
+
+
+def prepare_task_yaml(task_yaml_path, extract_dir):
+    """Point the dataset paths of an extracted task.yaml at its absolute folder.
+
+    Returns (task_yaml, task_yaml_path_for_generation, abs_paths_info, sample_folder).
+    When a dataset path was rewritten, the updated YAML is written next to the
+    extraction as task_abs.yaml and that path is returned instead of the original.
+    """
+    with open(task_yaml_path, 'r', encoding='utf-8') as f:
+        task_yaml = yaml.safe_load(f)
+    # Always set the absolute path to the parent directory of task_yaml_path
+    sample_folder = os.path.abspath(os.path.dirname(task_yaml_path))
+    dataset_desc = task_yaml.get('dataset_description', {})
+    updated = False
+    abs_paths_info = {}
+    for key in DATASET_PATH_KEYS:
+        if key in dataset_desc:
+            # Update the YAML for the LLM
+            dataset_desc[key] = sample_folder
+            # Use a clear key for UI display
+            abs_paths_info['absolute_path'] = sample_folder
+            updated = True
+    if updated:
+        # Write a new task.yaml with updated paths
+        abs_task_yaml_path = os.path.join(extract_dir, 'task_abs.yaml')
+        with open(abs_task_yaml_path, 'w', encoding='utf-8') as f:
+            yaml.dump(task_yaml, f, allow_unicode=True)
+        return task_yaml, abs_task_yaml_path, abs_paths_info, sample_folder
+    # No dataset path found, use original
+    return task_yaml, task_yaml_path, abs_paths_info, sample_folder
+
+
+def spool_upload(fileobj, chunk_size=CHUNK_SIZE):
+    """Copy an uploaded file to a temp .zip while hashing it, in a single chunked pass.
+
+    Returns (sha256_hexdigest, temp_zip_path); the caller owns the temp file.
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, prefix=UPLOAD_PREFIX, suffix='.zip') as tmp_zip:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp_zip.write(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), tmp_zip.name
+
+
+def file_digest(path, chunk_size=CHUNK_SIZE):
+    """sha256 hexdigest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_zip(zip_path):
+    """Return (names, task_yaml_name) using only the zip's central directory"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        names = zip_ref.namelist()
+    return names, find_task_yaml(names)
+
+
+def zip_sizes(zip_path):
+    """Return ({name: uncompressed_size}, task_yaml_name) from the zip's central directory"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        sizes = {info.filename: info.file_size for info in zip_ref.infolist()}
+    return sizes, find_task_yaml(sizes)
+
+
+def extract_members(zip_path, dest, members, cancel_event=None):
+    """Extract the given members to dest one by one (each member is streamed, not buffered)"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for member in members:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            zip_ref.extract(member, dest)
+    return True
+
+
+def start_background_extraction(zip_path, dest, skip=(), remove_zip=True):
+    """Extract every member of zip_path except `skip` into dest on a worker thread.
+
+    The temp zip is deleted once the extraction finishes when remove_zip is set.
+    Use wait_for_extraction()/cancel_extraction() with the same dest afterwards.
+    """
+    skip = set(skip)
+    cancel_event = threading.Event()
+
+    def run():
+        try:
+            names, _ = list_zip(zip_path)
+            return extract_members(zip_path, dest, [n for n in names if n not in skip], cancel_event)
+        finally:
+            if remove_zip:
+                try:
+                    os.unlink(zip_path)
+                except OSError:
+                    pass
+
+    with _extractions_lock:
+        _extractions[dest] = (_extract_pool.submit(run), cancel_event)
+
+
+def extraction_done(dest):
+    """True if no background extraction into dest is still running (see extraction_error for failures)"""
+    with _extractions_lock:
+        entry = _extractions.get(dest)
+    return entry is None or entry[0].done()
+
+
+def extraction_error(dest):
+    """The exception a finished background extraction into dest failed with, or None"""
+    with _extractions_lock:
+        entry = _extractions.get(dest)
+    if entry is None or not entry[0].done() or entry[0].cancelled():
+        return None
+    return entry[0].exception()
+
+
+def wait_for_extraction(dest, timeout=None):
+    """Block until the background extraction into dest has finished; re-raises its error"""
+    with _extractions_lock:
+        entry = _extractions.get(dest)
+    if entry is None:
+        return
+    entry[0].result(timeout)
+    with _extractions_lock:
+        if _extractions.get(dest) is entry:
+            del _extractions[dest]
+
+
+def cancel_extraction(dest):
+    """Stop a background extraction into dest (before its folder gets deleted)"""
+    with _extractions_lock:
+        entry = _extractions.pop(dest, None)
+    if entry is None:
+        return
+    future, cancel_event = entry
+    cancel_event.set()
+    try:
+        future.result()
+    except Exception as e:
+        print(f"Error in cancelled extraction: {e}")
@@ -0,0 +1,391 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: other processes' folders are never reaped
+    fcntl = None
+
+import bundle
+import dataset_index
+
+# Process-wide, content-addressed store of extracted task bundles. Every bundle is
+# extracted once into <STORE_DIR>/<instance>/<sha256> and shared by all sessions
+# of the process that upload the same bytes. Sessions hold references while they
+# use an extraction; entries nobody references stay around as a cache until the
+# store grows past its size limit, at which point the least recently used ones
+# are deleted.
+#
+# Sessions that close never release their reference, so references carry a
+# last-seen time (refreshed by touch() on every rerun) and a background reaper
+# drops the ones idle for longer than SESSION_TTL. The reaper also deletes
+# leftovers: folders of its own instance without an entry, spooled upload zips
+# and batch scratch folders older than ORPHAN_TTL, and the instance folders of
+# processes that have exited. Every instance holds an flock on OWNER_LOCK in its
+# folder for as long as it runs, so a folder whose lock can be taken is dead;
+# anything else in STORE_DIR (older layouts, instances still being set up under
+# a dot name) only goes after ORPHAN_TTL.
+STORE_DIR = os.getenv("BUNDLE_STORE_DIR", os.path.join(tempfile.gettempdir(), "task_bundle_store"))
+STORE_MAX_BYTES = int(os.getenv("BUNDLE_STORE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Largest (uncompressed) bundle one session may hold
+SESSION_QUOTA_BYTES = int(os.getenv("BUNDLE_SESSION_QUOTA_BYTES", str(2 * 1024 ** 3)))
+SESSION_TTL = float(os.getenv("BUNDLE_SESSION_TTL", str(2 * 3600)))
+ORPHAN_TTL = float(os.getenv("BUNDLE_ORPHAN_TTL", str(6 * 3600)))
+REAP_INTERVAL = float(os.getenv("BUNDLE_REAP_INTERVAL", "300"))
+# Temp-dir names left behind by spool_upload and the batch CLI
+ORPHAN_PREFIXES = (bundle.UPLOAD_PREFIX, "task_bundle_")
+OWNER_LOCK = ".owner.lock"
+
+
+class QuotaError(Exception):
+    """A bundle does not fit the per-session or the global storage quota"""
+
+
+class BundleStore:
+    """Reference-counted extraction store keyed by bundle hash"""
+
+    def __init__(self, root=STORE_DIR, max_bytes=STORE_MAX_BYTES, session_quota=SESSION_QUOTA_BYTES):
+        # root is shared by every process on the host; this store only writes to
+        # its own instance folder inside it
+        self.base = root
+        self.root = os.path.join(root, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self._owner_lock = None
+        self.max_bytes = max_bytes
+        self.session_quota = session_quota
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.reaped = {"sessions": 0, "evicted": 0, "orphans": 0, "orphan_bytes": 0}
+
+    def acquire(self, bundle_hash, session_id, zip_path):
+        """Return the store entry for bundle_hash and register session_id as a user.
+
+        zip_path is the spooled upload; it is consumed (extracted in the background
+        or deleted) either way. Returns None when the zip has no task.yaml and
+        raises QuotaError when the bundle does not fit the quotas.
+
+        The store lock is only held to look up or reserve the entry; reading the
+        zip, parsing task.yaml and building the index happen outside it, so other
+        sessions' touch() calls never wait for an ingest. Sessions uploading a
+        bundle that is still being ingested wait for that ingest instead.
+        """
+        self.start_reaper()
+        sizes = None
+        doomed = []
+        try:
+            while True:
+                with self._lock:
+                    entry = self._entries.get(bundle_hash)
+                    if entry is not None and entry["ready"].is_set():
+                        self._check_session_quota(entry["size"])
+                        entry["refs"][session_id] = entry["last_used"] = time.time()
+                        _remove_file(zip_path)
+                        return entry
+                    if entry is None and sizes is not None:
+                        entry, doomed = self._reserve(bundle_hash, session_id, sizes)
+                        break
+                if entry is not None:
+                    # Another session is ingesting the same bytes; if that fails its
+                    # reservation is dropped and this session takes over
+                    entry["ready"].wait()
+                    continue
+                # Read the central directory without the lock, then try to reserve
+                sizes, task_yaml_name = bundle.zip_sizes(zip_path)
+                if task_yaml_name is None:
+                    _remove_file(zip_path)
+                    return None
+                self._check_session_quota(sum(sizes.values()))
+        except QuotaError:
+            _remove_file(zip_path)
+            raise
+        finally:
+            self._delete(doomed)
+
+        try:
+            self._ingest(entry, zip_path, sizes, task_yaml_name)
+        except Exception:
+            with self._lock:
+                if self._entries.get(bundle_hash) is entry:
+                    del self._entries[bundle_hash]
+            self._remove(entry)
+            _remove_file(zip_path)
+            raise
+        finally:
+            entry["ready"].set()
+        return entry
+
+    def _reserve(self, bundle_hash, session_id, sizes):
+        """Add a not yet ingested entry for bundle_hash (lock held); returns (entry, evicted_entries).
+
+        The reservation counts against the store quota and, holding a reference,
+        cannot be evicted while it is ingested.
+        """
+        self._claim_root()
+        size = sum(sizes.values())
+        # Referenced bundles cannot be evicted, so they decide whether the new one fits
+        referenced = sum(e["size"] for e in self._entries.values() if e["refs"])
+        if referenced + size > self.max_bytes:
+            raise QuotaError(f"Bundle store is full ({referenced / 1024 ** 3:.1f} GB in use by "
+                             f"active sessions, limit {self.max_bytes / 1024 ** 3:.1f} GB); try again later")
+        # Make room before extracting
+        doomed = self._select_evictions(self.max_bytes - size)
+        entry = {
+            "hash": bundle_hash,
+            "dir": os.path.join(self.root, bundle_hash),
+            "files": len(sizes),
+            "size": size,
+            "refs": {session_id: time.time()},
+            "last_used": time.time(),
+            "ready": threading.Event(),
+        }
+        self._entries[bundle_hash] = entry
+        return entry, doomed
+
+    def _claim_root(self):
+        """Create the instance folder and lock it for the lifetime of the process (lock held)"""
+        if self._owner_lock is not None:
+            return
+        os.makedirs(self.base, exist_ok=True)
+        # Lock the folder before it gets its final name, so no reaper ever sees it unlocked
+        setup = tempfile.mkdtemp(dir=self.base, prefix=".new-")
+        lock = open(os.path.join(setup, OWNER_LOCK), 'a')
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(setup, self.root)
+        self._owner_lock = lock
+
+    def _check_session_quota(self, size):
+        if size > self.session_quota:
+            raise QuotaError(f"Bundle is {size / 1024 ** 3:.2f} GB uncompressed; the per-session limit is "
+                             f"{self.session_quota / 1024 ** 3:.2f} GB")
+
+    def _ingest(self, entry, zip_path, sizes, task_yaml_name):
+        """Fill a reserved entry: task.yaml, dataset index, background extraction (no lock held)"""
+        extract_dir = entry["dir"]
+        # A folder we have no entry for is left over from an earlier entry whose
+        # removal failed and may be incomplete, so start from scratch
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        os.makedirs(extract_dir)
+        # Extract only task.yaml now; the dataset follows in the background
+        bundle.extract_members(zip_path, extract_dir, [task_yaml_name])
+        task_yaml_path = os.path.join(extract_dir, task_yaml_name)
+        task_yaml, generation_yaml_path, abs_paths_info, sample_folder = bundle.prepare_task_yaml(task_yaml_path, extract_dir)
+        # The dataset index comes from the central directory too, so it is ready
+        # before the background extraction has written a single data file
+        prefix = os.path.relpath(sample_folder, extract_dir).replace(os.sep, '/')
+        index = dataset_index.DatasetIndex.from_zip_sizes(sizes, sample_folder, '' if prefix == '.' else prefix)
+        # Saved for the sandbox workers, which cannot walk a folder still being extracted
+        index.save(dataset_index.index_path(sample_folder))
+        bundle.start_background_extraction(zip_path, extract_dir, skip=[task_yaml_name])
+        # The member list lives in the index only; sessions keep the count
+        entry.update({
+            "task_yaml_path": task_yaml_path,
+            "generation_yaml_path": generation_yaml_path,
+            "task_yaml": task_yaml,
+            "abs_paths_info": abs_paths_info,
+            "sample_folder": sample_folder,
+            "index": index,
+        })
+
+    def get(self, bundle_hash):
+        """Return the entry for bundle_hash without registering a user, or None (also while it is ingested)"""
+        with self._lock:
+            entry = self._entries.get(bundle_hash)
+        return entry if entry is not None and entry["ready"].is_set() else None
+
+    def touch(self, bundle_hash, session_id):
+        """Mark session_id as still using bundle_hash; False if the entry or reference is gone"""
+        with self._lock:
+            entry = self._entries.get(bundle_hash)
+            if entry is None or session_id not in entry["refs"]:
+                return False
+            entry["refs"][session_id] = entry["last_used"] = time.time()
+            return True
+
+    def release(self, bundle_hash, session_id):
+        """Drop session_id's reference; the extraction stays cached until evicted"""
+        with self._lock:
+            entry = self._entries.get(bundle_hash)
+            if entry is not None:
+                entry["refs"].pop(session_id, None)
+                entry["last_used"] = time.time()
+        self.evict()
+
+    def discard(self, bundle_hash):
+        """Drop a broken extraction (e.g. its background extraction failed) for every session.
+
+        The folder is deleted, so the next upload of the same bytes extracts it again.
+        """
+        with self._lock:
+            entry = self._entries.get(bundle_hash)
+            if entry is None or not entry["ready"].is_set():
+                return
+            del self._entries[bundle_hash]
+        self._remove(entry)
+
+    def _total_bytes(self):
+        return sum(e["size"] for e in self._entries.values())
+
+    def _select_evictions(self, budget):
+        """Remove idle entries, least recently used first, until the store fits budget (lock held)"""
+        total = self._total_bytes()
+        doomed = []
+        if total <= budget:
+            return doomed
+        idle = sorted((e for e in self._entries.values() if not e["refs"]), key=lambda e: e["last_used"])
+        for entry in idle:
+            if total <= budget:
+                break
+            del self._entries[entry["hash"]]
+            total -= entry["size"]
+            doomed.append(entry)
+        return doomed
+
+    def _remove(self, entry):
+        bundle.cancel_extraction(entry["dir"])
+        shutil.rmtree(entry["dir"], ignore_errors=True)
+        # Inside the folder unless the sample folder is the extraction itself
+        _remove_file(dataset_index.index_path(entry.get("sample_folder") or entry["dir"]))
+
+    def _delete(self, entries):
+        # Deleting can take a while for big datasets, so do it outside the lock
+        for entry in entries:
+            self._remove(entry)
+        self.reaped["evicted"] += len(entries)
+
+    def evict(self):
+        """Delete unreferenced extractions, least recently used first, until the store fits max_bytes"""
+        with self._lock:
+            doomed = self._select_evictions(self.max_bytes)
+        self._delete(doomed)
+
+    # --- reaping -------------------------------------------------------------------
+    def reap(self, now=None):
+        """Drop abandoned references, then delete evictable entries and orphaned files"""
+        now = now or time.time()
+        with self._lock:
+            for entry in self._entries.values():
+                stale = [sid for sid, seen in entry["refs"].items() if now - seen > SESSION_TTL]
+                for sid in stale:
+                    del entry["refs"][sid]
+                self.reaped["sessions"] += len(stale)
+            known = {entry["dir"] for entry in self._entries.values()}
+        self.evict()
+        candidates = []
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                owner = path[:-len(dataset_index.INDEX_SUFFIX)] if path.endswith(dataset_index.INDEX_SUFFIX) else path
+                if name != OWNER_LOCK and owner not in known:
+                    candidates.append(path)
+        if os.path.isdir(self.base):
+            for name in os.listdir(self.base):
+                path = os.path.join(self.base, name)
+                if path == self.root:
+                    continue
+                if name.startswith('.') or not os.path.exists(os.path.join(path, OWNER_LOCK)):
+                    candidates.append(path)
+                elif fcntl is not None:
+                    self._reap_instance(path)
+        tmp = tempfile.gettempdir()
+        for name in os.listdir(tmp):
+            path = os.path.join(tmp, name)
+            # The store itself lives in the temp dir under a matching name
+            if name.startswith(ORPHAN_PREFIXES) and os.path.abspath(path) != os.path.abspath(self.base):
+                candidates.append(path)
+        for path in candidates:
+            try:
+                if now - os.path.getmtime(path) <= ORPHAN_TTL:
+                    continue
+            except OSError:
+                continue
+            self._delete_orphan(path)
+
+    def _reap_instance(self, path):
+        """Delete another instance's folder if its process is gone (its owner lock is free)"""
+        try:
+            lock = open(os.path.join(path, OWNER_LOCK), 'a')
+        except OSError:
+            return
+        with lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Still running
+                return
+            self._delete_orphan(path)
+
+    def _delete_orphan(self, path):
+        size = _tree_size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            _remove_file(path)
+        self.reaped["orphans"] += 1
+        self.reaped["orphan_bytes"] += size
+
+    def start_reaper(self):
+        """Run reap() every REAP_INTERVAL seconds on a daemon thread (once per store)"""
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_forever, name="bundle_reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"⚠️ Bundle reaper failed: {e}")
+
+    def usage(self, session_id=None):
+        """Summary of what the store currently holds (and what session_id holds, if given)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            sessions = set()
+            for e in entries:
+                sessions.update(e["refs"])
+            session_bytes = sum(e["size"] for e in entries if session_id in e["refs"])
+        return {
+            "entries": len(entries),
+            "referenced": sum(1 for e in entries if e["refs"]),
+            "sessions": len(sessions),
+            "bytes": sum(e["size"] for e in entries),
+            "referenced_bytes": sum(e["size"] for e in entries if e["refs"]),
+            "max_bytes": self.max_bytes,
+            "session_bytes": session_bytes,
+            "session_quota": self.session_quota,
+            "reaped": dict(self.reaped),
+        }
+
+
+def _tree_size(path):
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+store = BundleStore()
@@ -0,0 +1,204 @@
+import bisect
+import fnmatch
+import json
+import mimetypes
+import os
+import posixpath
+from collections import Counter
+
+# File index of a task bundle's dataset, built once at ingest time from the zip's
+# central directory (or a folder walk for unzipped bundles), so neither the
+# generation prompt nor the generated app has to scan the filesystem.
+#
+# Paths are stored relative to the sample folder (the folder of task.yaml, which
+# is what data_path points at), sorted, with '/' separators. Folder queries use
+# bisection on the sorted list, so filtering 100k+ files takes milliseconds.
+INDEX_SUFFIX = ".index.json"
+# Bundle bookkeeping files that are not part of the dataset
+IGNORED_NAMES = {"task.yaml", "task.yml", "task_abs.yaml"}
+
+
+def media_type(path):
+    """Coarse media type of a file: image, audio, video, text, application or other"""
+    guessed, _ = mimetypes.guess_type(path, strict=False)
+    if guessed is None:
+        return "other"
+    major = guessed.split('/', 1)[0]
+    if guessed in ("application/json", "application/xml", "application/x-yaml", "application/yaml"):
+        return "text"
+    return major if major in ("image", "audio", "video", "text", "application") else "other"
+
+
+class DatasetIndex:
+    """Queryable listing of the files under a bundle's sample folder"""
+
+    def __init__(self, root, files):
+        """root is the absolute sample folder; files is an iterable of (relative_path, size)"""
+        self.root = root
+        entries = sorted((path, size) for path, size in files
+                         if path and not path.endswith('/') and posixpath.basename(path) not in IGNORED_NAMES)
+        self.paths = [path for path, _ in entries]
+        self.sizes = [size for _, size in entries]
+        # Guessing is per extension, so memoize it for datasets with many files
+        by_ext = {}
+        self.media = []
+        for path in self.paths:
+            ext = posixpath.splitext(path)[1].lower()
+            if ext not in by_ext:
+                by_ext[ext] = media_type(path)
+            self.media.append(by_ext[ext])
+        self._groupings = None
+
+    # --- construction -----------------------------------------------------------
+    @classmethod
+    def from_zip_sizes(cls, sizes, root, prefix=""):
+        """Build from bundle.zip_sizes() output; prefix is the sample folder's path inside the zip"""
+        prefix = prefix.strip('/') + '/' if prefix.strip('/') else ""
+        return cls(root, ((name[len(prefix):], size) for name, size in sizes.items() if name.startswith(prefix)))
+
+    @classmethod
+    def from_folder(cls, root):
+        """Build by walking an already extracted folder"""
+        root = os.path.abspath(root)
+        files = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                try:
+                    size = os.path.getsize(full)
+                except OSError:
+                    continue
+                files.append((os.path.relpath(full, root).replace(os.sep, '/'), size))
+        return cls(root, files)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"root": self.root, "files": list(zip(self.paths, self.sizes))}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["root"], (tuple(item) for item in data["files"]))
+
+    # --- queries ------------------------------------------------------------------
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def total_size(self):
+        return sum(self.sizes)
+
+    def _range(self, folder):
+        """Index range of the files under folder (recursively)"""
+        folder = (folder or "").strip('/')
+        if not folder:
+            return 0, len(self.paths)
+        prefix = folder + '/'
+        start = bisect.bisect_left(self.paths, prefix)
+        # '0' sorts right after '/', so this bounds every path starting with prefix
+        end = bisect.bisect_left(self.paths, folder + '0', lo=start)
+        return start, end
+
+    def files(self, folder=None, media_type=None, ext=None, pattern=None, recursive=True, limit=None, absolute=True):
+        """List files, optionally filtered.
+
+        folder is relative to the sample folder; media_type is e.g. "image" or
+        "audio"; ext is an extension or a tuple of them (".jpg"); pattern is a
+        glob matched against the relative path. Returns absolute paths unless
+        absolute=False.
+        """
+        start, end = self._range(folder)
+        base = (folder or "").strip('/')
+        if isinstance(ext, str):
+            ext = (ext,)
+        if ext:
+            ext = tuple(e.lower() if e.startswith('.') else '.' + e.lower() for e in ext)
+        if recursive and media_type is None and not ext and pattern is None:
+            selected = self.paths[start:end if limit is None else min(end, start + limit)]
+            return [self.path(p) for p in selected] if absolute else selected
+        result = []
+        for i in range(start, end):
+            path = self.paths[i]
+            if not recursive and '/' in path[len(base) + 1 if base else 0:]:
+                continue
+            if media_type is not None and self.media[i] != media_type:
+                continue
+            if ext and not path.lower().endswith(ext):
+                continue
+            if pattern is not None and not fnmatch.fnmatch(path, pattern):
+                continue
+            result.append(self.path(path) if absolute else path)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def path(self, relative):
+        """Absolute path of a file given relative to the sample folder"""
+        return os.path.join(self.root, *relative.split('/'))
+
+    def folders(self):
+        """{folder: number of files directly inside it}; '' is the sample folder itself"""
+        return dict(Counter(posixpath.dirname(path) for path in self.paths))
+
+    def classes(self, folder=None):
+        """{subfolder name: number of files under it} for the direct subfolders of folder.
+
+        For class-per-folder datasets (data/cat/..., data/dog/...) this is the
+        class distribution of classes("data").
+        """
+        start, end = self._range(folder)
+        base = (folder or "").strip('/')
+        skip = len(base) + 1 if base else 0
+        counts = Counter()
+        for path in self.paths[start:end]:
+            rest = path[skip:]
+            if '/' in rest:
+                counts[rest.split('/', 1)[0]] += 1
+        return dict(counts)
+
+    def media_types(self, folder=None):
+        start, end = self._range(folder)
+        return dict(Counter(self.media[start:end]))
+
+    # --- prompt summary -------------------------------------------------------------
+    def groupings(self):
+        """Folders that contain two or more subfolders, with the file count of each subfolder"""
+        if self._groupings is not None:
+            return self._groupings
+        children = {}
+        for folder in self.folders():
+            parts = folder.split('/') if folder else []
+            for depth in range(len(parts)):
+                parent = '/'.join(parts[:depth])
+                children.setdefault(parent, set()).add(parts[depth])
+        # The index never changes, so the result is kept for UI reruns
+        self._groupings = {parent: self.classes(parent) for parent, names in sorted(children.items()) if len(names) >= 2}
+        return self._groupings
+
+    def summary(self, max_folders=15, max_groups=5, max_classes=20, max_examples=5):
+        """Compact description of the dataset structure for the generation prompt"""
+        extensions = Counter(posixpath.splitext(path)[1].lower() or "(none)" for path in self.paths)
+        lines = [
+            f"Root (data_path): {self.root}",
+            f"Files: {len(self)} ({self.total_size / 1024 / 1024:.1f} MB)",
+            "Media types: " + ", ".join(f"{k} {v}" for k, v in Counter(self.media).most_common()),
+            "Extensions: " + ", ".join(f"{k} {v}" for k, v in extensions.most_common(8)),
+        ]
+        groupings = self.groupings()
+        for parent, classes in list(groupings.items())[:max_groups]:
+            shown = sorted(classes.items(), key=lambda item: (-item[1], item[0]))[:max_classes]
+            more = f", ... {len(classes) - len(shown)} more" if len(classes) > len(shown) else ""
+            lines.append(f"Subfolders of '{parent or '.'}' ({len(classes)}): "
+                         + ", ".join(f"{name} ({count})" for name, count in shown) + more)
+        folders = sorted(self.folders().items(), key=lambda item: (-item[1], item[0]))
+        lines.append("Largest folders: " + ", ".join(f"'{name or '.'}' ({count})" for name, count in folders[:max_folders])
+                     + (f", ... {len(folders) - max_folders} more" if len(folders) > max_folders else ""))
+        step = max(1, len(self.paths) // max_examples)
+        lines.append("Example files: " + ", ".join(self.paths[::step][:max_examples]))
+        return "\n".join(lines)
+
+
+def index_path(sample_folder):
+    """Where the index of a sample folder is stored (next to, not inside, the dataset)"""
+    return sample_folder.rstrip(os.sep) + INDEX_SUFFIX
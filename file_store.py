@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import time
+
+# File helpers shared by the on-disk stores (LLM cache, sample cache, lineages,
+# templates, batch manifests).
+#
+# Records are JSON files replaced atomically: the new content is written to a
+# temp file in the same directory and renamed over the old one, so concurrent
+# readers see either version but never a partial file. Caches use the file mtime
+# as the last-used time (refreshed with touch() on every hit), which lets evict()
+# drop the least recently used entries without parsing them.
+
+
+def write_json(path, data, **dump_kwargs):
+    """Atomically replace path with data as JSON (json.dump keyword arguments pass through).
+
+    The temp file is removed and the error re-raised when writing fails.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove(tmp_path)
+        raise
+
+
+def touch(path):
+    """Mark a cache entry as just used"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def evict(directory, max_bytes, max_age=None, suffix='.json'):
+    """Delete entries of directory unused for max_age seconds, then the least recently used
+    ones until the rest fit max_bytes. Only files ending in suffix count (temp files of
+    writes in progress do not). Callers serialize their own evictions.
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    now = time.time()
+    entries = []
+    for name in names:
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if max_age is not None and now - st.st_mtime > max_age:
+            remove(path)
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        remove(path)
+        total -= size
+
+
+def remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
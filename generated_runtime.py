@@ -0,0 +1,115 @@
+import ast
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+import yaml
+
+import sample_runner
+from lazy_modules import LazyModule, timed_builtins
+
+# Runtime support for executing LLM-generated apps inside app.py.
+#
+# Generated code is parsed and compiled once per code hash (process-wide). The
+# first run of a session executes the whole module; later Streamlit reruns only
+# re-execute the top-level statements that are not imports, function or class
+# definitions, in the namespace kept from the first run, and then call main().
+# Module-level setup (imports, helpers, @st.cache_data functions) therefore
+# survives across reruns instead of being rebuilt on every widget interaction.
+SETUP_NODES = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+MAX_COMPILED = 32
+GENERATED_FILENAME = "<generated_app>"
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def compile_generated(code):
+    """Return (hash, full_code_object, rerun_code_object) for generated code, compiling at most once"""
+    key = code_hash(code)
+    with _compiled_lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return (key,) + _compiled[key]
+    tree = ast.parse(code, filename=GENERATED_FILENAME)
+    full = compile(tree, GENERATED_FILENAME, 'exec')
+    # Statements keep their original line numbers, so tracebacks still point at the right line
+    rerun_tree = ast.Module(body=[node for node in tree.body if not isinstance(node, SETUP_NODES)], type_ignores=[])
+    rerun = compile(rerun_tree, GENERATED_FILENAME, 'exec')
+    with _compiled_lock:
+        _compiled[key] = (full, rerun)
+        while len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return key, full, rerun
+
+
+def build_namespace(extra=None):
+    """Prepare a namespace for execution with the modules the generated code might need.
+
+    extra holds per-bundle host objects (e.g. {"dataset_index": ...}).
+    """
+    namespace = {
+        # Imports the generated code does itself show up in the import report
+        "__builtins__": timed_builtins(),
+        "st": st,
+        "os": os,
+        "yaml": yaml,
+        "tempfile": tempfile,
+        # Add any other modules the LLM is likely to use. The heavy ones are lazy
+        # proxies that only import when the generated code first touches them.
+        "pandas": LazyModule("pandas"),
+        "numpy": LazyModule("numpy"),
+        "requests": LazyModule("requests"),
+        "io": io,
+        "PIL": LazyModule("PIL"),
+        "librosa": LazyModule("librosa"),
+        # Host helper the prompts require for running the model API over the samples
+        "run_api_batch": sample_runner.run_api_batch,
+        "dataset_index": None,
+    }
+    namespace.update(extra or {})
+    return namespace
+
+
+def run_generated(code, session, extra=None):
+    """Execute generated code for one Streamlit rerun.
+
+    session is a dict-like owned by the caller (e.g. st.session_state) where the
+    module namespace is kept between reruns; extra is passed to build_namespace
+    on the first run. Returns (elapsed_seconds, first_run).
+    """
+    start = time.perf_counter()
+    key, full, rerun = compile_generated(code)
+    cached = session.get('generated_namespace')
+    first_run = cached is None or cached[0] != key
+    try:
+        if first_run:
+            namespace = build_namespace(extra)
+            exec(full, namespace)
+            session['generated_namespace'] = (key, namespace)
+        else:
+            namespace = cached[1]
+            exec(rerun, namespace)
+        # If a main() function is defined, call it to ensure UI is rendered
+        if 'main' in namespace and callable(namespace['main']):
+            namespace['main']()
+    except Exception:
+        # Start from a clean module on the next rerun after a failure (Streamlit's
+        # rerun/stop signals are BaseExceptions and keep the namespace)
+        session.pop('generated_namespace', None)
+        raise
+    return time.perf_counter() - start, first_run
+
+
+def reset(session):
+    """Forget the module namespace kept for this session"""
+    session.pop('generated_namespace', None)
@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Process-wide background executor for UI generations.
+#
+# Sessions submit main.main as a job and poll its state instead of running the
+# pipeline inside the Streamlit script thread, so reruns and reconnects do not
+# lose the work. Jobs get an ID and a progress state fed by main.main's progress
+# callback. Submissions with the key of a job that is still queued or running
+# (the bundle hash) get that job back instead of starting an identical one; each
+# submitter's on_done callback still runs with the result (e.g. to record it
+# under that session's lineage).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Finished jobs are forgotten this many seconds after they end
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))
+
+ACTIVE = ('queued', 'running')
+
+
+class Job:
+    """One background generation and the progress state sessions poll"""
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # {stage: {"status": ..., plus the data of its last event}}
+        self.stages = {}
+        self.current_stage = None
+        self.text = ""
+        self.trace = None
+        # on_done callbacks of every submitter; None once the result is being delivered
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def progress(self, stage, event, data=None):
+        """Progress callback for main.main(progress=...)"""
+        with self._lock:
+            if event == 'trace':
+                self.trace = data
+                return
+            if event == 'token':
+                self.text += data
+                return
+            info = self.stages.setdefault(stage, {})
+            if event == 'start':
+                self.current_stage = stage
+                self.text = ""
+                info.update(status='running')
+            elif event == 'first_token':
+                info["ttft"] = data
+            elif event == 'cached':
+                self.text = data
+                info.update(status='cached')
+            elif event == 'done':
+                info.update(data or {}, status='done')
+            elif event == 'skipped':
+                info.update(status='skipped', reason=data)
+            elif event == 'failed':
+                info.update(status='failed', error=data)
+
+    def snapshot(self):
+        """Consistent copy of the job state for rendering"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "key": self.key,
+                "status": self.status,
+                "result": self.result,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "stages": {name: dict(info) for name, info in self.stages.items()},
+                "current_stage": self.current_stage,
+                "text": self.text,
+                "trace": self.trace,
+            }
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+
+class JobExecutor:
+    """Bounded thread pool running jobs, with single-flight deduplication by key"""
+
+    def __init__(self, max_workers=JOB_WORKERS, ttl=JOB_TTL):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation_job")
+        self.ttl = ttl
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, on_done=None, **kwargs):
+        """Run fn(*args, progress=job.progress, **kwargs) in the background and return its Job.
+
+        When a job with the same (non-None) key is still active, that job is
+        returned and fn is not run again. on_done(result), if given, is called on
+        the job's thread once it succeeds, whether this call started the job or
+        joined it.
+        """
+        with self._lock:
+            self._reap()
+            if key is not None:
+                existing = self._inflight.get(key)
+                if existing is not None:
+                    with existing._lock:
+                        joined = existing._callbacks is not None
+                        if joined and on_done is not None:
+                            existing._callbacks.append(on_done)
+                    if joined:
+                        return existing
+            job = Job(key)
+            if on_done is not None:
+                job._callbacks.append(on_done)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._inflight[key] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        with job._lock:
+            job.status = 'running'
+            job.started = time.time()
+        try:
+            result = fn(*args, progress=job.progress, **kwargs)
+            error = None if result is not None else "pipeline returned no code"
+        except Exception as e:
+            traceback.print_exc()
+            result, error = None, f"{type(e).__name__}: {e}"
+        with job._lock:
+            # Later submissions with this key start a new job from here on
+            callbacks, job._callbacks = job._callbacks, None
+        if error is None:
+            for callback in callbacks:
+                try:
+                    callback(result)
+                except Exception:
+                    traceback.print_exc()
+        with job._lock:
+            job.result = result
+            job.error = error
+            job.status = 'done' if error is None else 'failed'
+            job.finished = time.time()
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    def get(self, job_id):
+        """Return the Job with job_id, or None if it is unknown or was forgotten"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _reap(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def usage(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "jobs": len(jobs),
+            "queued": sum(1 for j in jobs if j.status == 'queued'),
+            "running": sum(1 for j in jobs if j.status == 'running'),
+        }
+
+
+executor = JobExecutor()
@@ -0,0 +1,123 @@
+import argparse
+import builtins
+import importlib
+import json
+import subprocess
+import sys
+import threading
+import time
+import types
+
+# Lazy module proxies and import-time bookkeeping.
+#
+# LazyModule stands in for a heavy module (pandas, librosa, ...) in a namespace
+# and imports the real module the first time an attribute is accessed. Every
+# import done through this module is timed, as are the import statements of
+# generated apps (their namespace gets timed_builtins()), so the app can show
+# which modules cost how much, and `python lazy_modules.py` measures cold import
+# times in fresh interpreters to catch start-up regressions.
+DEFAULT_REPORT_MODULES = ["streamlit", "openai", "yaml", "requests", "pandas", "numpy", "PIL", "librosa", "main"]
+
+_import_times = {}
+_import_lock = threading.Lock()
+
+
+def import_timed(name):
+    """Import a module by name, recording how long the first import took"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _import_lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """__import__ replacement that records how long first imports of absolute module names take"""
+    if level or name in sys.modules:
+        return builtins.__import__(name, globals, locals, fromlist, level)
+    start = time.perf_counter()
+    module = builtins.__import__(name, globals, locals, fromlist, level)
+    with _import_lock:
+        _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def timed_builtins():
+    """__builtins__ for an exec namespace whose import statements are timed"""
+    return dict(vars(builtins), __import__=timed_import)
+
+
+def import_report():
+    """Return [(module_name, seconds)] for the imports timed in this process, slowest first"""
+    with _import_lock:
+        return sorted(_import_times.items(), key=lambda item: item[1], reverse=True)
+
+
+class LazyModule(types.ModuleType):
+    """Proxy that imports the named module on first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_target'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_target']
+        if module is None:
+            module = import_timed(self.__name__)
+            self.__dict__['_lazy_target'] = module
+            # Copy the module's globals so later lookups skip __getattr__ entirely
+            for attr, value in module.__dict__.items():
+                if attr not in ('__name__', '_lazy_target'):
+                    self.__dict__[attr] = value
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_lazy_target'] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def measure_cold_import(name):
+    """Import time of `name` in a fresh interpreter, in seconds (None if the import fails)"""
+    script = (
+        "import importlib, time\n"
+        "start = time.perf_counter()\n"
+        f"importlib.import_module({name!r})\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def cold_start_report(names=None, repeat=3):
+    """Best-of-`repeat` cold import time for each module"""
+    report = {}
+    for name in names or DEFAULT_REPORT_MODULES:
+        times = [t for t in (measure_cold_import(name) for _ in range(repeat)) if t is not None]
+        report[name] = min(times) if times else None
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold import times of the app's heavy modules")
+    parser.add_argument('modules', nargs='*', help="Modules to measure (default: the app's usual imports)")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="Runs per module; the best one is reported")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON for regression tracking")
+    args = parser.parse_args()
+    report = cold_start_report(args.modules, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, seconds in sorted(report.items(), key=lambda item: item[1] or 0, reverse=True):
+            shown = f"{seconds * 1000:9.1f} ms" if seconds is not None else "   failed"
+            print(f"{shown}  {name}")
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+import file_store
+
+# Bundle lineages for incremental regeneration.
+#
+# A lineage is a name for "the same task bundle over time" (session id plus upload
+# name in the UI, the bundle path in batch runs, ...). After every successful generation
+# the task.yaml, the extracted information and the final code are stored under
+# that name, so the next run can diff the new task.yaml against the previous one
+# section by section and redo only the work the changes affect: paths and
+# endpoints are substituted locally, other edits become a targeted patch request
+# instead of a full three-stage generation.
+LINEAGE_DIR = os.getenv("LINEAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lineage"))
+# Values under these keys are substituted verbatim in the previous code
+SUBSTITUTABLE_KEYS = {'api_url', 'data_path', 'data_source'}
+
+_PIPELINE_FILES = ["main.py", "static_check.py", "prompt_budget.py", "templates.py", "lineage.py"]
+
+
+def pipeline_fingerprint():
+    """Hash of the prompt-building sources; code made by another version is not reused"""
+    digest = hashlib.sha256()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in _PIPELINE_FILES:
+        try:
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+    return digest.hexdigest()[:16]
+
+
+def _record_path(name):
+    return os.path.join(LINEAGE_DIR, hashlib.sha256(name.encode('utf-8')).hexdigest()[:24] + ".json")
+
+
+def load(name):
+    """Return the last record of lineage `name` made by this pipeline version, or None"""
+    try:
+        with open(_record_path(name), 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("pipeline") != pipeline_fingerprint():
+        return None
+    return record
+
+
+def save(name, task_yaml, extracted_info, code):
+    record = {
+        "lineage": name,
+        "pipeline": pipeline_fingerprint(),
+        "updated_at": time.time(),
+        "task_yaml": task_yaml,
+        "extracted_info": extracted_info,
+        "code": code,
+    }
+    file_store.write_json(_record_path(name), record, ensure_ascii=False, default=str)
+
+
+def adopt(name, task_yaml, code):
+    """Make code the latest version of lineage `name` unless it already is.
+
+    For results a session did not generate under its own lineage (e.g. a job
+    another session started for the same bundle); the extracted information is
+    not known then and is stored as None.
+    """
+    previous = load(name)
+    if previous is None or previous["code"] != code:
+        save(name, task_yaml, None, code)
+
+
+def diff(old, new, path=()):
+    """List the leaf-level differences between two parsed task.yaml files.
+
+    Each change is {"path": "a.b.c", "section": "a", "key": "c", "old": ..., "new": ...};
+    lists are compared as a whole.
+    """
+    changes = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in list(old) + [k for k in new if k not in old]:
+            changes.extend(diff(old.get(key), new.get(key), path + (str(key),)))
+        return changes
+    if old != new:
+        changes.append({
+            "path": ".".join(path),
+            "section": path[0] if path else "",
+            "key": path[-1] if path else "",
+            "old": old,
+            "new": new,
+        })
+    return changes
+
+
+def format_changes(changes):
+    return "\n".join(f"- {c['path']}: {json.dumps(c['old'], default=str)} -> {json.dumps(c['new'], default=str)}"
+                     for c in changes)
+
+
+def substitute_literals(code, changes):
+    """Apply path/endpoint changes by replacing the old literal values in code.
+
+    Returns (code, remaining_changes) where remaining_changes could not be applied locally.
+    Several keys often hold the same value (data_path and data_source both name the
+    sample folder), so a pair already replaced, or whose new value is already in
+    the code, counts as applied.
+    """
+    remaining = []
+    applied = set()
+    for change in changes:
+        old, new = change["old"], change["new"]
+        if change["key"] in SUBSTITUTABLE_KEYS and isinstance(old, str) and isinstance(new, str) and old:
+            if (old, new) in applied:
+                continue
+            if old in code:
+                code = code.replace(old, new)
+                applied.add((old, new))
+                continue
+            if new in code:
+                continue
+        remaining.append(change)
+    return code, remaining
+
+
+_SEARCH_REPLACE = re.compile(r'<<<<<<< SEARCH\n(.*?)\n?=======\n(.*?)\n?>>>>>>> REPLACE', re.DOTALL)
+
+
+def apply_search_replace(code, reply):
+    """Apply SEARCH/REPLACE blocks from an LLM reply; None if a block does not match the code"""
+    blocks = _SEARCH_REPLACE.findall(reply or "")
+    if not blocks:
+        return None
+    for search, replace in blocks:
+        if not search or search not in code:
+            return None
+        code = code.replace(search, replace, 1)
+    return code
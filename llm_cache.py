@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import file_store
+
+# On-disk, content-addressed cache for the LLM stages of the generation pipeline.
+# Every entry is one JSON file named after its key; the file mtime doubles as the
+# "last used" timestamp so eviction can drop the least recently used entries first.
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache"))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+CACHE_MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+_lock = threading.Lock()
+
+
+def normalize_task_yaml(task_yaml):
+    """Return a canonical string for a parsed task.yaml (key order and formatting independent)"""
+    return json.dumps(task_yaml, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def make_key(stage, prompt, model, params, task_yaml=None):
+    """Build the cache key of one pipeline stage from everything that influences its output"""
+    payload = {
+        "stage": stage,
+        "task": normalize_task_yaml(task_yaml) if task_yaml is not None else None,
+        "prompt": prompt,
+        "model": model,
+        "params": params or {},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def get(key):
+    """Return the cached value for key, or None on a miss or an expired entry"""
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get('created', 0) > CACHE_MAX_AGE:
+        file_store.remove(path)
+        return None
+    # Touch the entry so LRU eviction sees it as recently used
+    file_store.touch(path)
+    return entry.get('value')
+
+
+def put(key, value, stage=None):
+    """Store value under key and evict old entries if the cache grew past its limits"""
+    if value is None:
+        return
+    entry = {"created": time.time(), "stage": stage, "value": value}
+    try:
+        file_store.write_json(_entry_path(key), entry, ensure_ascii=False)
+    except OSError as e:
+        print(f"⚠️ Could not write LLM cache entry: {e}")
+        return
+    evict()
+
+
+def evict():
+    """Drop expired entries, then least recently used ones until the cache fits CACHE_MAX_BYTES"""
+    with _lock:
+        # mtime is refreshed on every hit, so an entry older than the max age was
+        # neither written nor read recently and can go without being parsed
+        file_store.evict(CACHE_DIR, CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE)
+
+
+def clear():
+    """Remove every cache entry"""
+    with _lock:
+        if os.path.isdir(CACHE_DIR):
+            for name in os.listdir(CACHE_DIR):
+                file_store.remove(os.path.join(CACHE_DIR, name))
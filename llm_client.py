@@ -0,0 +1,226 @@
+import collections
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import lazy_modules
+
+# Resilient chat-completions client shared by every LLM call of the pipeline.
+#
+# - One pooled HTTP connection pool (httpx, which openai already depends on)
+# - A deadline per call covering all attempts; every attempt gets the time left
+# - Retries on 408/409/429/5xx, timeouts and connection errors, with jittered
+#   exponential backoff that honours Retry-After / retry-after-ms
+# - Optional hedging for non-streaming calls: when an attempt is still running
+#   after the observed p95 latency, a second identical request is fired and the
+#   first successful answer wins
+# - An optional throttle (e.g. a rate_limit.RateLimiter's acquire) is called
+#   before every request sent, retries and hedges included
+# - Streaming calls are retried only until the first token has been delivered;
+#   their deadline covers the whole stream, which is closed when it runs out
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The LLM call failed after all retries (or with a non-retryable error)"""
+
+    def __init__(self, message, attempts=0):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies for the hedging threshold"""
+
+    def __init__(self, window=200):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, fraction, min_samples):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LLMClient:
+    def __init__(self, api_key=None, base_url=None, deadline=180.0, attempt_timeout=120.0, max_retries=4,
+                 backoff_base=0.5, backoff_max=30.0, max_connections=20, hedge=False,
+                 hedge_quantile=0.95, hedge_min_samples=20):
+        openai = lazy_modules.import_timed("openai")
+        httpx = lazy_modules.import_timed("httpx")
+        self._openai = openai
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=attempt_timeout,
+        )
+        # Retries are handled here, so the SDK's own retry loop is disabled
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyTracker()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="llm_hedge")
+
+    # --- error classification -------------------------------------------------
+    def _is_retryable(self, error):
+        openai = self._openai
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS
+        return False
+
+    @staticmethod
+    def _retry_after(error):
+        """Server-requested delay in seconds, if the error response carried one"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+        try:
+            if headers.get('retry-after-ms'):
+                return float(headers['retry-after-ms']) / 1000.0
+            if headers.get('retry-after'):
+                return float(headers['retry-after'])
+        except ValueError:
+            return None
+        return None
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _with_retries(self, call, meta, deadline):
+        """Run call(timeout) until it succeeds, the retries run out or the deadline passes"""
+        end = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise LLMError("LLM call deadline exceeded", attempt)
+            try:
+                return call(min(self.attempt_timeout, remaining))
+            except Exception as e:
+                attempt += 1
+                if not self._is_retryable(e) or attempt > self.max_retries:
+                    raise LLMError(f"{type(e).__name__}: {e}", attempt) from e
+                delay = self._backoff(attempt - 1, e)
+                if delay >= end - time.monotonic():
+                    raise LLMError(f"{type(e).__name__}: {e} (no time left to retry)", attempt) from e
+                meta["retries"] = meta.get("retries", 0) + 1
+                print(f"🔁 LLM call failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    # --- public API -------------------------------------------------------------
+    def complete(self, model, messages, params, deadline=None, meta=None, throttle=None):
+        """Non-streaming completion; returns the SDK response object.
+
+        meta (a dict) receives "retries" and "hedged". throttle(), if given, is
+        called before each request is sent.
+        """
+        meta = meta if meta is not None else {}
+        meta.setdefault("retries", 0)
+        meta.setdefault("hedged", False)
+
+        def attempt(timeout):
+            start = time.monotonic()
+            response = self._hedged(model, messages, params, timeout, meta, throttle)
+            self.latencies.add(time.monotonic() - start)
+            return response
+
+        return self._with_retries(attempt, meta, deadline)
+
+    def _create(self, model, messages, params, timeout, throttle=None):
+        if throttle is not None:
+            throttle()
+        return self.client.chat.completions.create(model=model, messages=messages, timeout=timeout, **params)
+
+    def _hedged(self, model, messages, params, timeout, meta, throttle=None):
+        threshold = self.latencies.quantile(self.hedge_quantile, self.hedge_min_samples) if self.hedge else None
+        if threshold is None or threshold >= timeout:
+            return self._create(model, messages, params, timeout, throttle)
+        first = self._hedge_pool.submit(self._create, model, messages, params, timeout, throttle)
+        done, _ = wait([first], timeout=threshold)
+        if done:
+            return first.result()
+        meta["hedged"] = True
+        second = self._hedge_pool.submit(self._create, model, messages, params, max(0.1, timeout - threshold),
+                                         throttle)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower request keeps running in the pool; its result is ignored
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stream(self, model, messages, params, deadline=None, meta=None, throttle=None):
+        """Streaming completion; yields SDK chunks. Retries only before the first chunk arrives.
+
+        The deadline covers the whole stream: once it passes, the response is
+        closed and LLMError is raised. A stalled stream is additionally bounded by
+        the per-read timeout of the HTTP client.
+        """
+        meta = meta if meta is not None else {}
+        meta.setdefault("retries", 0)
+        meta.setdefault("hedged", False)
+        end = time.monotonic() + (deadline or self.deadline)
+
+        def open_stream(timeout):
+            if throttle is not None:
+                throttle()
+            response = self.client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                           timeout=timeout, **params)
+            iterator = iter(response)
+            # Pull the first chunk inside the retry loop: most failures happen before it
+            try:
+                return response, iterator, next(iterator, None)
+            except BaseException:
+                # A retried attempt must not keep its connection checked out
+                self._close(response)
+                raise
+
+        response, iterator, first = self._with_retries(open_stream, meta, end - time.monotonic())
+        try:
+            if first is None:
+                return
+            yield first
+            for chunk in iterator:
+                if time.monotonic() > end:
+                    raise LLMError("LLM stream deadline exceeded", meta["retries"] + 1)
+                yield chunk
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"stream interrupted: {type(e).__name__}: {e}", meta["retries"] + 1) from e
+        finally:
+            self._close(response)
+
+    @staticmethod
+    def _close(response):
+        close = getattr(response, 'close', None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception:
+            pass
@@ -1,7 +1,21 @@
-import openai
 import yaml
 import os
+import argparse
+import time
+import threading
+import contextvars
+import functools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
+import llm_cache
+import static_check
+import prompt_budget
+import tracing
+import lineage
+import dataset_index
+import sandbox
+import templates
+from llm_client import LLMClient, LLMError
 os.environ.pop("SSL_CERT_FILE", None)
 
 load_dotenv('env.env')
@@ -9,18 +23,86 @@ OPEN_API_KEY = os.getenv("OPENAI_API_KEY")
 OPEN_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME")
 
 
-client = openai.OpenAI(api_key=OPEN_API_KEY)
+LLM_MODEL = "gpt-4.1-nano-2025-04-14"
+# Sampling parameters per stage; they are part of the cache key
+EXTRACTION_PARAMS = {}
+GENERATION_PARAMS = {"temperature": 0.3, "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "4000"))}
+# Token budget for the stage 1 prompt; large task.yaml files are compacted to fit
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Stage 3 mode: 'auto' runs local static checks and only asks the LLM about the
+# failing snippets (or skips the review when the code is clean), 'always' sends
+# the whole file for review as before, 'never' skips the review stage
+REVIEW_MODE = os.getenv("REVIEW_MODE", "auto")
+
+# Incremental regeneration: with more changed task.yaml fields than this the
+# previous code is not patched but regenerated from scratch
+INCREMENTAL_MAX_CHANGES = int(os.getenv("INCREMENTAL_MAX_CHANGES", "15"))
+
+# Speculative generation: with more than one candidate, stages 2-3 run for every
+# candidate in parallel, each result is smoke-tested in the sandbox pool and the
+# first one that passes is returned
+GENERATION_CANDIDATES = int(os.getenv("GENERATION_CANDIDATES", "1"))
+
+# Template library (see templates.py): 'instantiate' reuses an approved app with
+# the same input keys and output type without calling the LLM when its endpoint
+# and paths can be substituted, 'reference' only passes it to the generation
+# prompt, 'off' ignores the library
+TEMPLATE_MODE = os.getenv("TEMPLATE_MODE", "instantiate")
+
+# Optional rate_limit.RateLimiter shared by every LLM call (set by the batch CLI)
+rate_limiter = None
+
+# Settings of the shared LLM client (see llm_client.LLMClient)
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "180"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+
+# The client (and the openai package itself) is only created on first use,
+# so importing this module stays cheap for app.py
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the shared, pooled LLM client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    api_key=OPEN_API_KEY,
+                    base_url=os.getenv("OPENAI_BASE_URL"),
+                    deadline=LLM_DEADLINE,
+                    attempt_timeout=LLM_ATTEMPT_TIMEOUT,
+                    max_retries=LLM_MAX_RETRIES,
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    hedge=LLM_HEDGE,
+                )
+    return _client
+
 def read_task_yaml(path):
     with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
     
-def extract_task_information(task_yaml):
-    """Step 1: Let LLM read and extract all important information from task.yaml"""
+def build_extraction_prompt(task_yaml, token_budget=None):
+    """Step 1: Create prompt asking the LLM to extract all important information from task.yaml"""
+    if token_budget is None:
+        token_budget = PROMPT_TOKEN_BUDGET
+    # Whatever the instructions do not use is left for the YAML
+    yaml_budget = token_budget - prompt_budget.count_tokens(_extraction_prompt(""))
+    yaml_text, yaml_tokens, level = prompt_budget.fit_yaml(task_yaml, yaml_budget)
+    if level:
+        print(f"✂️ task.yaml compacted to {yaml_tokens} tokens (level {level}) to fit the prompt budget")
+    return _extraction_prompt(yaml_text)
+
+def _extraction_prompt(yaml_text):
     extraction_prompt = f"""
 Analyze this YAML configuration and extract key information for Streamlit application development:
 
 YAML Content:
-{yaml.dump(task_yaml, default_flow_style=False)}
+{yaml_text}
 
 Extract and organize:
 
@@ -47,18 +129,21 @@ Extract and organize:
 
 Return as structured JSON-like format for code generation.
 """
-    
-    response = client.chat.completions.create(
-        model="gpt-4.1-nano-2025-04-14",
-        messages=[{"role": "user", "content": extraction_prompt}]
-    )
-    
-    extracted_info = response.choices[0].message.content
+    return extraction_prompt
+
+def extract_task_information(task_yaml, use_cache=True, progress=None):
+    """Step 1: Let LLM read and extract all important information from task.yaml"""
+    extraction_prompt = build_extraction_prompt(task_yaml)
+    extracted_info = run_llm_stage("extract", extraction_prompt, task_yaml, EXTRACTION_PARAMS, use_cache, progress)
     print("✅ Step 1: Task information extracted")
     return extracted_info
 
-def build_code_generation_prompt(extracted_info, task_yaml):
-    """Step 2: Create comprehensive prompt for code generation using extracted information"""
+def build_code_generation_prompt(extracted_info, task_yaml, dataset_summary=None, reference_code=None):
+    """Step 2: Create comprehensive prompt for code generation using extracted information.
+
+    dataset_summary is the DatasetIndex.summary() of the bundle, if one was built;
+    reference_code is an approved app for a task of the same shape, if any.
+    """
     # Get specific technical details
     api_url = task_yaml.get('model_information', {}).get('api_url', 'API_URL_NOT_SPECIFIED')
     sample_path = task_yaml.get('dataset_description', {}).get('data_path', './data')
@@ -66,6 +151,26 @@ def build_code_generation_prompt(extracted_info, task_yaml):
     input_keys = list(task_yaml['model_information']['input_format']['structure'].keys())
     first_key = input_keys[0] if input_keys else 'data'
     print(sample_path)
+    dataset_section = ""
+    if dataset_summary:
+        dataset_section = f"""
+DATASET INDEX (precomputed when the bundle was ingested):
+{dataset_summary}
+
+The host provides a variable dataset_index (already defined; do not import, define or rebuild it) that lists these files without touching the filesystem. Use it instead of os.walk/os.listdir/glob:
+- dataset_index.files(folder=None, media_type=None, ext=None, pattern=None, recursive=True, limit=None) -> list of absolute file paths; folder is relative to the data path, media_type is "image", "audio", "video", "text" or "application", ext is e.g. ".jpg" or a tuple, pattern is a glob on the relative path
+- dataset_index.classes(folder) -> {{subfolder name: file count}} for the direct subfolders of folder (e.g. the classes of a class-per-folder dataset)
+- dataset_index.folders() -> {{folder: file count}}, len(dataset_index) -> number of files, dataset_index.root -> the data path
+"""
+    reference_section = ""
+    if reference_code:
+        reference_section = f"""
+REFERENCE APPLICATION (approved for an earlier task with the same payload keys and output format):
+```python
+{reference_code}
+```
+Start from the reference application: keep its structure, API handling and UI, and change only what this task's requirements, endpoint and paths need.
+"""
     prompt = f"""
 IMPORTANT INSTRUCTIONS FOR CODE GENERATION:
 - The path will be the absolute path to the folder containing task.yaml, the data folder, and any additional files or folders. Use this path as the root for all file and folder access. Do not assume a subfolder unless it is specified in task.yaml.
@@ -82,7 +187,7 @@ TECHNICAL SPECS:
 - API Endpoint: {api_url}
 - Sample Path: {sample_path}
 - Output Format: {output_type}
-
+{dataset_section}{reference_section}
 CRITICAL API RULES:
 1. Payload structure: Use only {input_keys} as keys, not descriptions
    - Example: {{{first_key}: "actual_value"}}
@@ -100,6 +205,10 @@ CRITICAL API RULES:
         - Second, there's a list wrapper, we use data = response_json["data"][0] to unwrap the wrapper
         We have to try the first, then check if the type(data) = {output_type}, then we stop, else we check the 2nd circumstance
    - The data be in format: {output_type}
+3. Running the samples: never call requests.post in a loop. The host provides a function run_api_batch (already defined; do not import or define it):
+   - results = run_api_batch(api_url, payloads, progress=lambda done, total: progress_bar.progress(done / total))
+   - payloads is a list of payload dicts; results is a list in the same order, each a dict with "ok", "json" (the parsed response, i.e. response_json above), "error" and "cached"
+   - It sends the requests concurrently over pooled connections and caches the responses, so show results for every sample with result["ok"] and report result["error"] otherwise
 
 IMPLEMENTATION REQUIREMENTS:
 - Complete Streamlit app with all imports
@@ -143,6 +252,7 @@ CRITICAL CHECKS:
         - If there's no wrapper: response_json = response.json() -> data = response_json["data"] -> results = data
         - Make sure the results is {output_type} format
    - Proper error handling for API calls
+   - Samples are sent with the host-provided run_api_batch(api_url, payloads, progress=...) (not defined or imported in the code), never with requests.post in a loop; each result has "ok", "json" and "error"
 
 2. **Code Quality**:
    - All imports present and correct (io, sys, ..., all used lib must be include)
@@ -167,22 +277,215 @@ OUTPUT:
 """
     return review_prompt
 
-def main(task_yaml_path='task.yaml'):
+def build_snippet_review_prompt(snippets, task_yaml):
+    """Step 3 (narrowed): Create prompt asking the LLM to fix only the snippets flagged by the static checks"""
+    api_url = task_yaml.get('model_information', {}).get('api_url', 'API_URL_NOT_SPECIFIED')
+    output_type = task_yaml.get('model_information', {}).get('output_format', {}).get('type', 'unknown')
+    snippet_blocks = []
+    for number, snippet in enumerate(snippets, 1):
+        snippet_blocks.append(f"""SNIPPET {number} (lines {snippet['start']}-{snippet['end']}):
+Diagnostics:
+{static_check.format_diagnostics(snippet['diagnostics'])}
+```python
+{snippet['text']}```""")
+    snippets_text = "\n\n".join(snippet_blocks)
+    review_prompt = f"""
+Static analysis found problems in a generated Streamlit application. Below are only the affected snippets of the file, with the diagnostics for each.
+
+CONTEXT:
+- API Endpoint: {api_url}
+- Output Format: {output_type}
+
+{snippets_text}
+
+Fix every diagnostic:
+- Replace deprecated APIs with their current equivalents (use_container_width instead of use_column_width, Styler.to_html() instead of .render(), ImageDraw.textbbox()/textlength() instead of textsize()).
+- Fix syntax errors and undefined names without changing unrelated behaviour.
+- Replace API calls made inside loops with one call to run_api_batch(api_url, payloads, progress=...), which the host provides (do not import or define it); it returns a list of dicts with "ok", "json" and "error" in payload order.
+- Keep the indentation of each snippet exactly as it is, because it is pasted back into the file.
+
+OUTPUT:
+- Return every snippet, in order, as a line "SNIPPET <number>" followed by the corrected code in a ```python block
+- No explanations
+"""
+    return review_prompt
+
+def build_patch_prompt(previous_code, changes, task_yaml):
+    """Step 2 (incremental): Ask for targeted edits of the previous app after task.yaml changed"""
+    api_url = task_yaml.get('model_information', {}).get('api_url', 'API_URL_NOT_SPECIFIED')
+    output_type = task_yaml.get('model_information', {}).get('output_format', {}).get('type', 'unknown')
+    input_keys = list(task_yaml.get('model_information', {}).get('input_format', {}).get('structure', {}).keys())
+    patch_prompt = f"""
+The Streamlit application below was generated from a task.yaml that has since been edited. Update the application so it matches the new task.yaml, changing as little code as possible.
+
+TASK.YAML CHANGES (path: old -> new):
+{lineage.format_changes(changes)}
+
+CURRENT SPECS:
+- API Endpoint: {api_url}
+- Payload keys: {input_keys}
+- Output Format: {output_type}
+
+CURRENT APPLICATION:
+```python
+{previous_code}
+```
+
+OUTPUT:
+- Return only edit blocks in this exact format, one per change:
+<<<<<<< SEARCH
+lines copied exactly from the current application
+=======
+replacement lines
+>>>>>>> REPLACE
+- Each SEARCH part must match the current application character for character, including indentation, and be long enough to be unique
+- Keep the existing API rules (payload keys only, "data" field unwrapping, samples sent with the host-provided run_api_batch) and avoid deprecated Streamlit, pandas and Pillow APIs
+- No explanations
+"""
+    return patch_prompt
+
+def review_code(generated_code, task_yaml, use_cache=True, progress=None, mode=None):
+    """Step 3: Check the generated code locally and involve the LLM only where needed"""
+    mode = mode or REVIEW_MODE
+    code = clean_generated_code_str(generated_code)
+    if mode == 'never':
+        tracing.set_attribute("review_outcome", 'disabled')
+        return code
+    if mode == 'auto':
+        diagnostics = static_check.check_code(code)
+        code, diagnostics = static_check.fix_missing_imports(code, diagnostics)
+        if not diagnostics:
+            print("✅ Static checks passed, skipping LLM review")
+            tracing.set_attribute("review_outcome", 'skipped')
+            if progress is not None:
+                progress("review", 'skipped', "static checks passed")
+            return code
+        print(f"🔎 Static checks found {len(diagnostics)} issue(s), reviewing affected snippets only")
+        snippets = static_check.build_snippets(code, diagnostics)
+        review_prompt = build_snippet_review_prompt(snippets, task_yaml)
+        try:
+            reply = run_llm_stage("review", review_prompt, task_yaml, GENERATION_PARAMS, use_cache, progress)
+        except LLMError:
+            print("❌ Failed to review code, using initial version")
+            tracing.set_attribute("review_outcome", 'failed')
+            return code
+        if reply is not None:
+            if reply.strip() == "CODE_APPROVED":
+                tracing.set_attribute("review_outcome", 'approved')
+                return code
+            patched = static_check.apply_snippet_fixes(code, snippets, reply)
+            if patched is not None and not any(d["code"] == "syntax-error" for d in static_check.check_code(patched)):
+                print("🔧 Code issues found and fixed")
+                tracing.set_attribute("review_outcome", 'patched')
+                return patched
+        print("⚠️ Could not apply snippet fixes, falling back to a full review")
+
+    review_prompt = build_review_prompt(code, task_yaml)
+    try:
+        reviewed_code = run_llm_stage("review", review_prompt, task_yaml, GENERATION_PARAMS, use_cache, progress)
+    except LLMError:
+        reviewed_code = None
+    if reviewed_code is None:
+        print("❌ Failed to review code, using initial version")
+        tracing.set_attribute("review_outcome", 'failed')
+        return code
+    # Check if code needs fixing or is approved
+    if reviewed_code.strip() == "CODE_APPROVED":
+        print("✅ Generated code approved without changes")
+        tracing.set_attribute("review_outcome", 'approved')
+        return code
+    print("🔧 Code issues found and fixed")
+    tracing.set_attribute("review_outcome", 'rewritten')
+    return reviewed_code
+
+def main(task_yaml_path='task.yaml', use_cache=True, progress=None, lineage_name=None, dataset_summary=None,
+         candidates=None, template_mode=None):
+    """Run the three-stage pipeline.
+
+    progress, if given, is called as progress(stage, event, data) and switches the
+    LLM calls to streaming mode. Events are 'start', 'cached' (data = cached text),
+    'first_token' (data = seconds to first token), 'token' (data = text chunk),
+    'done' (data = {"elapsed": ..., "ttft": ..., "usage": {"prompt_tokens": ...,
+    "completion_tokens": ...}}), 'skipped' (data = reason) and 'failed' (data =
+    error message). When the run is over, progress("pipeline", 'trace', trace_dict)
+    reports its tracing data.
+
+    lineage_name names the bundle across edits (see lineage.py). When the previous
+    run of that lineage is available, only the stages affected by the task.yaml
+    changes are re-run. dataset_summary (DatasetIndex.summary()) is added to the
+    code generation prompt. candidates overrides GENERATION_CANDIDATES and
+    template_mode overrides TEMPLATE_MODE.
+
+    Raises llm_client.LLMError if stage 1 or 2 cannot reach the model; a failed
+    review keeps the generated code and is recorded in the trace.
+    """
+    with tracing.trace_run(task_yaml_path, LLM_MODEL) as trace:
+        final_code = run_pipeline(task_yaml_path, use_cache, progress, lineage_name, dataset_summary, candidates,
+                                  template_mode)
+        if final_code is None:
+            tracing.set_attribute("status", 'failed')
+    if progress is not None:
+        progress("pipeline", 'trace', trace.data)
+    return final_code
+
+def run_pipeline(task_yaml_path, use_cache=True, progress=None, lineage_name=None, dataset_summary=None,
+                 candidates=None, template_mode=None):
     print("🚀 Starting Multi-Stage Code Generation Pipeline...")
+    candidates = candidates or GENERATION_CANDIDATES
+    template_mode = template_mode or TEMPLATE_MODE
     
     # Load task configuration
     task_yaml = read_task_yaml(task_yaml_path)
     output_type = task_yaml['model_information']['output_format']['type']
     print("📖 Task YAML loaded successfully")
+
+    previous = lineage.load(lineage_name) if lineage_name else None
+    if previous is not None:
+        final_code = run_incremental(previous, task_yaml, use_cache, progress)
+        if final_code is not None:
+            lineage.save(lineage_name, task_yaml, previous["extracted_info"], final_code)
+            print("\n🎉 Pipeline completed successfully!")
+            return final_code
     
+    template = templates.find(task_yaml) if template_mode != 'off' else None
+    if template is not None and template_mode == 'instantiate':
+        final_code = run_template(template, task_yaml, use_cache, progress)
+        if final_code is not None:
+            if lineage_name:
+                lineage.save(lineage_name, task_yaml, None, final_code)
+            print("\n🎉 Pipeline completed successfully!")
+            return final_code
+    reference_code = template["code"] if template is not None else None
+    if reference_code:
+        tracing.set_attribute("template", {"signature": template["signature"], "mode": 'reference'})
+        print(f"📚 Using approved template {template['signature']} as a reference")
+
+    if candidates > 1:
+        # Start the sandbox workers while stage 1 runs
+        sandbox.prewarm()
+
     # Stage 1: Extract task information
     print("\n📋 Stage 1: Extracting task information...")
-    extracted_info = extract_task_information(task_yaml)
+    with tracing.stage("extract"):
+        extracted_info = extract_task_information(task_yaml, use_cache, progress)
+    if extracted_info is None:
+        print("❌ Failed to extract task information")
+        return None
     
+    code_prompt = build_code_generation_prompt(extracted_info, task_yaml, dataset_summary, reference_code)
+    if candidates > 1:
+        print(f"\n🔨 Stages 2-3: Generating {candidates} candidates and smoke-testing them...")
+        with tracing.stage("candidates"):
+            final_code = generate_candidates(code_prompt, task_yaml, candidates, use_cache, progress)
+        if lineage_name:
+            lineage.save(lineage_name, task_yaml, extracted_info, final_code)
+        print("\n🎉 Pipeline completed successfully!")
+        return final_code
+
     # Stage 2: Generate code using extracted information
     print("\n🔨 Stage 2: Generating Streamlit application code...")
-    code_prompt = build_code_generation_prompt(extracted_info, task_yaml)
-    generated_code = call_llm(code_prompt)
+    with tracing.stage("generate"):
+        generated_code = run_llm_stage("generate", code_prompt, task_yaml, GENERATION_PARAMS, use_cache, progress)
     
     if generated_code is None:
         print("❌ Failed to generate code")
@@ -190,39 +493,263 @@ def main(task_yaml_path='task.yaml'):
     
     # Stage 3: Review and fix the generated code
     print("\n🔍 Stage 3: Reviewing and fixing generated code...")
-    review_prompt = build_review_prompt(generated_code, task_yaml)
-    reviewed_code = call_llm(review_prompt)
-    
-    if reviewed_code is None:
-        print("❌ Failed to review code, using initial version")
-        final_code = generated_code
-    else:
-        # Check if code needs fixing or is approved
-        if reviewed_code.strip() == "CODE_APPROVED":
-            print("✅ Generated code approved without changes")
-            final_code = generated_code
-        else:
-            print("🔧 Code issues found and fixed")
-            final_code = reviewed_code
+    with tracing.stage("review"):
+        final_code = review_code(generated_code, task_yaml, use_cache, progress)
     
     # Clean markdown markers if present
     final_code = clean_generated_code_str(final_code)
+    if lineage_name:
+        lineage.save(lineage_name, task_yaml, extracted_info, final_code)
     print("\n🎉 Pipeline completed successfully!")
     return final_code
 
-def call_llm(prompt):
-    """Call OpenAI API with the given prompt"""
+def generate_candidates(code_prompt, task_yaml, candidates, use_cache=True, progress=None):
+    """Stages 2-3, speculative: build several candidates in parallel and return the first that works.
+
+    Every candidate is generated (with its own seed) and reviewed on a worker
+    thread, then smoke-tested in the sandbox pool as soon as it is ready. A test
+    that misses its deadline fails; tests lost to the pool being recycled for it
+    are run once more. If no candidate passes, the first one built is returned
+    anyway.
+    """
+    data_path = task_yaml.get('dataset_description', {}).get('data_path')
+
+    def build(index):
+        params = GENERATION_PARAMS if index == 0 else dict(GENERATION_PARAMS, seed=index)
+        # Only the first candidate reports to the progress callback
+        stage_progress = progress if index == 0 else None
+        code = run_llm_stage("generate", code_prompt, task_yaml, params, use_cache, stage_progress)
+        # Candidates share the trace; keep each one's review outcome apart
+        with tracing.scoped_attributes({}) as attributes:
+            code = clean_generated_code_str(review_code(code, task_yaml, use_cache, stage_progress))
+        return code, attributes.get("review_outcome")
+
+    pool = ThreadPoolExecutor(max_workers=candidates, thread_name_prefix="candidate")
+    # Worker threads do not inherit the context, so hand each one the current trace
+    builds = {pool.submit(contextvars.copy_context().run, build, index): index for index in range(candidates)}
+    tests = {}
+    deadlines = {}
+    retried = set()
+    built = {}
+    reviews = {}
+    report = []
+    error = None
+    pending = set(builds)
+
+    def start_test(index):
+        test = sandbox.submit(built[index], data_path)
+        tests[test] = index
+        deadlines[test] = sandbox.deadline()
+        pending.add(test)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-nano-2025-04-14",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=4000
-        )
+        while pending:
+            running = [deadlines[future] for future in pending if future in deadlines]
+            timeout = max(0.0, min(running) - time.monotonic()) if running else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            expired = {future for future in pending if future in deadlines and deadlines[future] <= now}
+            pending -= expired
+            for future in list(done) + list(expired):
+                if future in builds:
+                    index = builds[future]
+                    try:
+                        built[index], reviews[index] = future.result()
+                    except LLMError as e:
+                        print(f"❌ Candidate {index} could not be generated: {e}")
+                        error = e
+                        continue
+                    start_test(index)
+                    continue
+                index = tests[future]
+                outcome = sandbox.expire(future) if future in expired else sandbox.result(future)
+                if outcome.get("crashed") and index not in retried:
+                    print(f"🔁 Candidate {index}'s smoke test was lost with its worker, running it again")
+                    retried.add(index)
+                    start_test(index)
+                    continue
+                report.append(dict(outcome, candidate=index, review_outcome=reviews[index]))
+                tracing.set_attribute("candidates", {"requested": candidates, "tests": report})
+                if outcome["ok"]:
+                    print(f"✅ Candidate {index} passed the smoke test ({outcome['elapsed']:.1f}s)")
+                    tracing.set_attribute("candidates", {"requested": candidates, "tests": report, "chosen": index})
+                    tracing.set_attribute("review_outcome", reviews[index])
+                    return built[index]
+                print(f"⚠️ Candidate {index} failed the smoke test: {outcome['error']}")
+    finally:
+        # Candidates still being generated are not waited for
+        pool.shutdown(wait=False, cancel_futures=True)
+    if not built:
+        raise error
+    chosen = min(built)
+    print(f"⚠️ No candidate passed the smoke test, using candidate {chosen}")
+    tracing.set_attribute("candidates", {"requested": candidates, "tests": report, "chosen": chosen})
+    tracing.set_attribute("review_outcome", reviews[chosen])
+    return built[chosen]
+
+def run_template(template, task_yaml, use_cache=True, progress=None):
+    """Instantiate an approved template for task_yaml; None if it cannot be reused as is"""
+    if progress is None:
+        progress = _no_progress
+    code = templates.instantiate(template, task_yaml)
+    if code is None:
+        print(f"📚 Template {template['signature']} matches but cannot be instantiated, using it as a reference")
+        return None
+    print(f"📚 Instantiated approved template {template['signature']}, skipping generation")
+    tracing.set_attribute("template", {"signature": template["signature"], "mode": 'instantiated'})
+    progress("extract", 'skipped', "approved template for this task shape")
+    progress("generate", 'skipped', f"template {template['signature']} instantiated")
+    print("\n🔍 Stage 3: Reviewing and fixing generated code...")
+    with tracing.stage("review"):
+        final_code = review_code(code, task_yaml, use_cache, progress)
+    return clean_generated_code_str(final_code)
+
+def run_incremental(previous, task_yaml, use_cache=True, progress=None):
+    """Update the previous code of a lineage for the new task.yaml.
+
+    Returns None when the changes are too large or the patch cannot be applied,
+    in which case the caller runs the full pipeline.
+    """
+    if progress is None:
+        progress = _no_progress
+    changes = lineage.diff(previous["task_yaml"], task_yaml)
+    if len(changes) > INCREMENTAL_MAX_CHANGES:
+        print(f"📝 {len(changes)} task.yaml changes since the last generation, regenerating from scratch")
+        return None
+    sections = sorted({c["section"] for c in changes})
+    tracing.set_attribute("incremental", {"changes": len(changes), "sections": sections})
+    print(f"📝 Incremental run: {len(changes)} change(s) in {sections or 'no section'}")
+    # Stage 1 output only feeds the full generation prompt; the patch works from the diff
+    progress("extract", 'skipped', "reused from the previous version")
+
+    code, remaining = lineage.substitute_literals(previous["code"], changes)
+    if not remaining:
+        progress("generate", 'skipped', "paths and endpoint updated locally" if changes else "task.yaml unchanged")
+    else:
+        print(f"\n🩹 Stage 2: Patching the previous code for {len(remaining)} change(s)...")
+        with tracing.stage("generate"):
+            patch_prompt = build_patch_prompt(code, remaining, task_yaml)
+            reply = run_llm_stage("generate", patch_prompt, task_yaml, GENERATION_PARAMS, use_cache, progress)
+        patched = lineage.apply_search_replace(code, reply)
+        if patched is None:
+            print("⚠️ Could not apply the patch, regenerating from scratch")
+            tracing.set_attribute("incremental", {"changes": len(changes), "sections": sections, "fallback": True})
+            return None
+        code = patched
+
+    print("\n🔍 Stage 3: Reviewing and fixing generated code...")
+    with tracing.stage("review"):
+        final_code = review_code(code, task_yaml, use_cache, progress)
+    return clean_generated_code_str(final_code)
+
+def call_llm(prompt, params=None, on_token=None, usage=None):
+    """Call OpenAI API with the given prompt.
+
+    When on_token is given the completion is streamed and on_token(text) is called
+    for every chunk as it arrives; the full text is still returned at the end.
+    If usage is a dict it receives the reported token counts, the finish reason,
+    and the number of retries and whether the request was hedged.
+    Raises llm_client.LLMError once the retries or the deadline are exhausted.
+    """
+    if params is None:
+        params = GENERATION_PARAMS
+    if usage is None:
+        usage = {}
+    messages = [{"role": "user", "content": prompt}]
+    if on_token is None:
+        response = get_client().complete(LLM_MODEL, messages, params, meta=usage, throttle=_throttle(prompt, params))
+        _record_usage(usage, response.usage, response.choices[0].finish_reason)
         return response.choices[0].message.content
-    except Exception as e:
-        print(f"❌ Error calling LLM: {e}")
+    parts = []
+    for text in stream_llm(prompt, params, usage):
+        parts.append(text)
+        on_token(text)
+    return ''.join(parts)
+
+def stream_llm(prompt, params=None, usage=None):
+    """Call OpenAI API in streaming mode, yielding text chunks as they arrive"""
+    if params is None:
+        params = GENERATION_PARAMS
+    if usage is None:
+        usage = {}
+    messages = [{"role": "user", "content": prompt}]
+    stream_params = dict(params, stream_options={"include_usage": True})
+    finish_reason = None
+    for chunk in get_client().stream(LLM_MODEL, messages, stream_params, meta=usage,
+                                     throttle=_throttle(prompt, params)):
+        if getattr(chunk, 'usage', None) is not None:
+            _record_usage(usage, chunk.usage, finish_reason)
+        if chunk.choices:
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            if chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    if finish_reason:
+        usage["finish_reason"] = finish_reason
+
+def _throttle(prompt, params):
+    """Rate limiter hook for the client: every request it sends (retries and hedges too) is counted"""
+    if rate_limiter is None:
         return None
+    return functools.partial(rate_limiter.acquire, prompt_budget.count_tokens(prompt) + params.get('max_tokens', 0))
+
+def _record_usage(usage, reported, finish_reason):
+    if usage is None:
+        return
+    if reported is not None:
+        usage["prompt_tokens"] = reported.prompt_tokens
+        usage["completion_tokens"] = reported.completion_tokens
+    if finish_reason:
+        usage["finish_reason"] = finish_reason
+
+def run_llm_stage(stage, prompt, task_yaml, params, use_cache=True, progress=None):
+    """Call the LLM for one pipeline stage, reusing the on-disk cache when possible"""
+    if progress is None:
+        progress = _no_progress
+    progress(stage, 'start', None)
+    key = llm_cache.make_key(stage, prompt, LLM_MODEL, params, task_yaml)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            print(f"♻️ Cache hit for stage '{stage}'")
+            tracing.record_llm_call(stage, cached=True)
+            progress(stage, 'cached', cached)
+            return cached
+
+    start = time.perf_counter()
+    timing = {"ttft": None}
+    def on_token(text):
+        if timing["ttft"] is None:
+            timing["ttft"] = time.perf_counter() - start
+            progress(stage, 'first_token', timing["ttft"])
+        progress(stage, 'token', text)
+
+    # Only stream when somebody is listening; plain calls keep the simpler request
+    usage = {}
+    try:
+        result = call_llm(prompt, params, on_token if progress is not _no_progress else None, usage)
+    except LLMError as e:
+        print(f"❌ Error calling LLM: {e}")
+        tracing.record_llm_call(stage, time.perf_counter() - start, timing["ttft"], usage,
+                                retries=usage.get("retries", 0), ok=False)
+        progress(stage, 'failed', str(e))
+        raise
+    elapsed = time.perf_counter() - start
+    if "prompt_tokens" not in usage:
+        # The API did not report usage; count locally instead
+        usage["prompt_tokens"] = prompt_budget.count_tokens(prompt)
+        usage["completion_tokens"] = prompt_budget.count_tokens(result)
+        usage["estimated"] = True
+    print(f"📏 Stage '{stage}': {usage['prompt_tokens']} prompt tokens, {usage['completion_tokens']} completion tokens")
+    if usage.get("finish_reason") == 'length':
+        print(f"⚠️ Stage '{stage}' hit the max_tokens cap ({params.get('max_tokens')}); the output is truncated")
+    tracing.record_llm_call(stage, elapsed, timing["ttft"], usage, retries=usage.get("retries", 0), ok=result is not None)
+    progress(stage, 'done', {"elapsed": elapsed, "ttft": timing["ttft"], "usage": usage})
+    if use_cache and result is not None:
+        llm_cache.put(key, result, stage)
+    return result
+
+def _no_progress(stage, event, data):
+    pass
 
 def clean_generated_code_str(code_str):
     """Remove first and last lines from generated code string if they are markdown markers."""
@@ -236,6 +763,20 @@ def clean_generated_code_str(code_str):
 
 if __name__ == "__main__":
     # For standalone CLI use
-    code = main()
-    with open('generated_ui.py', 'w', encoding='utf-8') as f:
-        f.write(code)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate a Streamlit UI from a task.yaml")
+    parser.add_argument('task_yaml', nargs='?', default='task.yaml', help="Path to task.yaml")
+    parser.add_argument('-o', '--output', default='generated_ui.py', help="Where to write the generated app")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not update the LLM stage cache")
+    parser.add_argument('--full', action='store_true', help="Regenerate from scratch instead of patching the previous app")
+    parser.add_argument('-n', '--candidates', type=int, default=None,
+                        help="Generate this many candidates in parallel and keep the first that passes a smoke test")
+    args = parser.parse_args()
+    # --no-cache means nothing from earlier runs is reused, the previous app included
+    lineage_name = None if args.full or args.no_cache else os.path.abspath(args.task_yaml)
+    index = dataset_index.DatasetIndex.from_folder(os.path.dirname(os.path.abspath(args.task_yaml)))
+    code = main(args.task_yaml, use_cache=not args.no_cache, lineage_name=lineage_name,
+                dataset_summary=index.summary() if len(index) else None, candidates=args.candidates)
+    if code is None:
+        raise SystemExit(1)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(code)
@@ -0,0 +1,93 @@
+import yaml
+
+import rate_limit
+
+# Token counting and token-budgeted YAML rendering for the pipeline prompts.
+#
+# Token counts use tiktoken when it is installed and fall back to the rough
+# character-based estimate otherwise. fit_yaml() renders a task.yaml within a
+# token budget by progressively sampling long lists and mappings (label lists,
+# class enumerations) and shortening long free-text fields, while leaving the
+# fields code generation depends on (endpoint, paths, input keys, output type)
+# untouched.
+TIKTOKEN_ENCODING = "o200k_base"
+
+# Progressively tighter (max_items, max_chars) limits tried by fit_yaml()
+COMPACTION_LEVELS = [(None, None), (50, 2000), (20, 600), (10, 200), (5, 100), (3, 60)]
+# String values under these keys are never shortened
+PROTECTED_KEYS = {'api_url', 'data_path', 'data_source', 'type', 'format'}
+# Mappings under these keys always keep all of their keys (values may still be compacted)
+KEEP_ALL_KEYS = {'structure', 'model_information', 'dataset_description', 'input_format', 'output_format'}
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception:
+            _encoder = None
+    return _encoder
+
+
+def count_tokens(text):
+    """Number of tokens in text (exact with tiktoken, estimated without it)"""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is None:
+        return rate_limit.estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def compact(value, max_items=None, max_chars=None, key=None, top=True):
+    """Return a copy of a parsed YAML value with long lists, mappings and strings shortened.
+
+    The top-level mapping always keeps every section; only their contents shrink.
+    """
+    if isinstance(value, dict):
+        items = list(value.items())
+        keep_all = top or key in KEEP_ALL_KEYS or max_items is None
+        shown = items if keep_all else items[:max_items]
+        result = {k: compact(v, max_items, max_chars, k, False) for k, v in shown}
+        if len(shown) < len(items):
+            result['...'] = f"({len(items) - len(shown)} more entries omitted)"
+        return result
+    if isinstance(value, list):
+        if max_items is None or len(value) <= max_items:
+            return [compact(v, max_items, max_chars, key, False) for v in value]
+        # Keep a sample from the start and the end so the shape of the list stays visible
+        head = max(1, max_items - 1)
+        sample = value[:head] + value[-1:]
+        result = [compact(v, max_items, max_chars, key, False) for v in sample]
+        result.insert(head, f"... ({len(value) - len(sample)} more items omitted)")
+        return result
+    if isinstance(value, str) and max_chars is not None and key not in PROTECTED_KEYS and len(value) > max_chars:
+        collapsed = ' '.join(value.split())
+        if len(collapsed) > max_chars:
+            collapsed = collapsed[:max_chars].rstrip() + " ... (truncated)"
+        return collapsed
+    return value
+
+
+def fit_yaml(task_yaml, budget_tokens=None):
+    """Dump task_yaml as YAML, compacting it until it fits budget_tokens.
+
+    Returns (yaml_text, tokens, level) where level is the index into
+    COMPACTION_LEVELS that was needed (0 means the YAML is unchanged).
+    """
+    text = yaml.dump(task_yaml, default_flow_style=False)
+    tokens = count_tokens(text)
+    if budget_tokens is None or tokens <= budget_tokens:
+        return text, tokens, 0
+    for level, (max_items, max_chars) in enumerate(COMPACTION_LEVELS[1:], 1):
+        text = yaml.dump(compact(task_yaml, max_items, max_chars), default_flow_style=False, sort_keys=False)
+        tokens = count_tokens(text)
+        if tokens <= budget_tokens:
+            break
+    return text, tokens, level
@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Client-side limiter for requests per minute and tokens per minute.
+
+    Both limits are token buckets that refill continuously over a one minute
+    window. acquire() blocks the calling thread until the request fits into both
+    buckets, so it can be shared by any number of worker threads.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_budget = float(requests_per_minute or 0)
+        self._token_budget = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_budget = min(self.requests_per_minute,
+                                       self._request_budget + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._token_budget = min(self.tokens_per_minute,
+                                     self._token_budget + elapsed * self.tokens_per_minute / 60.0)
+
+    def acquire(self, tokens=0):
+        """Block until one request of roughly `tokens` tokens may be sent"""
+        if self.tokens_per_minute:
+            # A single request larger than the whole minute budget could never fit
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._request_budget < 1:
+                    wait = max(wait, (1 - self._request_budget) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_budget < tokens:
+                    wait = max(wait, (tokens - self._token_budget) * 60.0 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._request_budget -= 1
+                    if self.tokens_per_minute:
+                        self._token_budget -= tokens
+                    return
+            time.sleep(wait)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English and code)"""
+    return len(text) // 4 + 1
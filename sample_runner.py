@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import file_store
+import lazy_modules
+
+# Host-provided helper that generated apps use to run the model API over many
+# samples. app.py injects run_api_batch into the exec namespace and the
+# generation prompts require it instead of a hand-written requests loop:
+#
+# - One pooled requests.Session (keep-alive connections) shared by all apps
+# - Payloads are POSTed concurrently by a bounded thread pool
+# - progress(done, total) is called from the calling thread, so it can update
+#   Streamlit widgets directly
+# - Successful responses are cached on disk by (api_url, payload hash), so
+#   re-running the same samples returns immediately
+SAMPLE_CACHE_DIR = os.getenv("SAMPLE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sample_cache"))
+SAMPLE_CACHE_MAX_BYTES = int(os.getenv("SAMPLE_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+SAMPLE_WORKERS = int(os.getenv("SAMPLE_WORKERS", "8"))
+SAMPLE_TIMEOUT = float(os.getenv("SAMPLE_TIMEOUT", "60"))
+
+_session = None
+_session_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+
+def get_session():
+    """Return the shared HTTP session, creating it (and importing requests) on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                requests = lazy_modules.import_timed("requests")
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=SAMPLE_WORKERS)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def make_key(api_url, payload):
+    raw = json.dumps({"url": api_url, "payload": payload}, sort_keys=True, ensure_ascii=False,
+                     separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(SAMPLE_CACHE_DIR, f"{key}.json")
+
+
+def _cache_get(key):
+    path = _entry_path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    file_store.touch(path)
+    return entry
+
+
+def _cache_put(key, entry):
+    try:
+        file_store.write_json(_entry_path(key), entry, ensure_ascii=False)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def evict():
+    """Drop least recently used responses until the cache fits SAMPLE_CACHE_MAX_BYTES"""
+    with _evict_lock:
+        file_store.evict(SAMPLE_CACHE_DIR, SAMPLE_CACHE_MAX_BYTES)
+
+
+def post_sample(api_url, payload, timeout=None, use_cache=True):
+    """POST one payload; returns {"ok", "status_code", "json", "error", "cached", "elapsed"}"""
+    key = make_key(api_url, payload)
+    if use_cache:
+        entry = _cache_get(key)
+        if entry is not None:
+            return dict(entry, ok=True, error=None, cached=True, elapsed=0.0)
+    start = time.perf_counter()
+    result = {"ok": False, "status_code": None, "json": None, "error": None, "cached": False}
+    try:
+        response = get_session().post(api_url, json=payload, timeout=timeout or SAMPLE_TIMEOUT)
+        result["status_code"] = response.status_code
+        try:
+            result["json"] = response.json()
+        except ValueError:
+            result["error"] = f"non-JSON response: {response.text[:200]}"
+        if not response.ok:
+            result["error"] = result["error"] or f"HTTP {response.status_code}"
+        result["ok"] = result["error"] is None
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = time.perf_counter() - start
+    if result["ok"] and use_cache:
+        _cache_put(key, {"status_code": result["status_code"], "json": result["json"]})
+    return result
+
+
+def run_api_batch(api_url, payloads, progress=None, max_workers=None, timeout=None, use_cache=True):
+    """POST every payload to api_url concurrently and return the results in input order.
+
+    Each result is a dict with "ok", "status_code", "json" (the parsed response
+    body), "error", "cached" and "elapsed". progress(done, total), if given, is
+    called from the calling thread after every finished payload.
+    """
+    payloads = list(payloads)
+    total = len(payloads)
+    results = [None] * total
+    done = 0
+    workers = max(1, min(max_workers or SAMPLE_WORKERS, total or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sample_runner") as pool:
+        futures = {pool.submit(post_sample, api_url, payload, timeout, use_cache): index
+                   for index, payload in enumerate(payloads)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done += 1
+            if progress is not None:
+                progress(done, total)
+    if use_cache and any(r["ok"] and not r["cached"] for r in results):
+        evict()
+    return results
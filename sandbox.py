@@ -0,0 +1,180 @@
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Smoke tests for generated apps, run in a pool of long-lived worker processes.
+#
+# Workers are started ahead of time (prewarm) and import streamlit, its testing
+# harness and the heavy libraries generated apps use once, so a test only pays
+# for running the script. Each test executes the candidate through
+# generated_runtime exactly like app.py does (same namespace, same host helpers,
+# the bundle's dataset index) under streamlit.testing.v1.AppTest, and fails if
+# the script raises. Only the initial render is exercised: no widgets are
+# clicked, so the model API is never called. A test that hangs, or whose script
+# AppTest gives up on (its thread keeps running in the worker), gets the pool
+# replaced and its worker processes killed.
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "30"))
+# Seconds a test may take on top of the script timeout (worker start-up, harness)
+SANDBOX_GRACE = float(os.getenv("SANDBOX_GRACE", "30"))
+SANDBOX_PRELOAD = [name for name in os.getenv("SANDBOX_PRELOAD", "pandas,numpy,PIL,requests").split(",") if name]
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_HARNESS = '''
+import sys
+sys.path.insert(0, {root!r})
+import generated_runtime
+import sandbox
+generated_runtime.run_generated({code!r}, {{}}, extra={{"dataset_index": sandbox.load_index({data_path!r})}})
+'''
+
+_pool = None
+_pool_lock = threading.Lock()
+# Test future -> the pool it runs in
+_owners = weakref.WeakKeyDictionary()
+# Per worker process: {data_path: DatasetIndex or None}
+_indexes = {}
+
+
+def _warm():
+    """Worker initializer: pay the import cost once per process"""
+    sys.path.insert(0, _ROOT)
+    importlib.import_module("streamlit.testing.v1")
+    importlib.import_module("generated_runtime")
+    for name in SANDBOX_PRELOAD:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _ready():
+    return os.getpid()
+
+
+def get_pool():
+    """Return the shared worker pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking a threaded Streamlit server is unsafe; the fork server
+                # starts clean workers instead (spawn where it is unavailable)
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(max_workers=SANDBOX_WORKERS, initializer=_warm,
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def recycle(pool):
+    """Stop using pool and kill its workers; the next test starts a new pool.
+
+    Tests still running in it fail with BrokenProcessPool (reported as crashed).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # shutdown() alone leaves a hung worker running forever
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        if process.is_alive():
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def prewarm():
+    """Start every worker now (e.g. while stage 1 runs) instead of at the first test"""
+    pool = get_pool()
+    for _ in range(SANDBOX_WORKERS):
+        pool.submit(_ready)
+
+
+def load_index(data_path):
+    """Dataset index for a sample folder, loaded once per worker process.
+
+    Bundles ingested by the bundle store have their index saved next to the
+    sample folder (built from the zip, so it is complete while the folder is
+    still being extracted); other folders are walked.
+    """
+    if data_path not in _indexes:
+        import dataset_index
+        index = None
+        if data_path and os.path.isfile(dataset_index.index_path(data_path)):
+            index = dataset_index.DatasetIndex.load(dataset_index.index_path(data_path))
+        elif data_path and os.path.isdir(data_path):
+            index = dataset_index.DatasetIndex.from_folder(data_path)
+        _indexes[data_path] = index
+    return _indexes[data_path]
+
+
+def _smoke_test(code, data_path, timeout):
+    from streamlit.testing.v1 import AppTest
+    start = time.perf_counter()
+    try:
+        app = AppTest.from_string(_HARNESS.format(root=_ROOT, code=code, data_path=data_path), default_timeout=timeout)
+        app.run()
+    except Exception as e:
+        # Raised for timeouts and harness failures, not for errors in the script;
+        # the script may still be running in this process
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "elapsed": time.perf_counter() - start,
+                "recycle": True}
+    errors = [element.message for element in app.exception]
+    return {"ok": not errors, "error": errors[0] if errors else None, "elapsed": time.perf_counter() - start}
+
+
+def submit(code, data_path=None, timeout=None):
+    """Start a smoke test of generated code; returns a Future of {"ok", "error", "elapsed"}"""
+    pool = get_pool()
+    try:
+        future = pool.submit(_smoke_test, code, data_path, timeout or SANDBOX_TIMEOUT)
+    except BrokenProcessPool:
+        recycle(pool)
+        pool = get_pool()
+        future = pool.submit(_smoke_test, code, data_path, timeout or SANDBOX_TIMEOUT)
+    _owners[future] = pool
+    return future
+
+
+def deadline(timeout=None):
+    """time.monotonic() value by which a test submitted now has to be done"""
+    return time.monotonic() + (timeout or SANDBOX_TIMEOUT) + SANDBOX_GRACE
+
+
+def expire(future):
+    """Give up on a test past its deadline: fail it and recycle its pool"""
+    future.cancel()
+    pool = _owners.pop(future, None)
+    if pool is not None:
+        recycle(pool)
+    return {"ok": False, "error": "smoke test timed out", "elapsed": None}
+
+
+def result(future, timeout=None):
+    """Wait for a smoke test; worker crashes and hangs count as failures.
+
+    Outcomes of tests that never got to run to the end because their worker or
+    pool went away have "crashed" set; they can be submitted again.
+    """
+    try:
+        outcome = future.result((timeout or SANDBOX_TIMEOUT) + SANDBOX_GRACE)
+    except TimeoutError:
+        return expire(future)
+    except (BrokenProcessPool, CancelledError) as e:
+        pool = _owners.pop(future, None)
+        if pool is not None:
+            recycle(pool)
+        return {"ok": False, "error": f"sandbox worker crashed: {type(e).__name__}: {e}", "elapsed": None,
+                "crashed": True}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "elapsed": None}
+    if outcome.pop("recycle", False):
+        pool = _owners.pop(future, None)
+        if pool is not None:
+            recycle(pool)
+    return outcome
@@ -0,0 +1,246 @@
+import ast
+import builtins
+import re
+
+# Local, AST-based checks for generated Streamlit apps. They cover the issues the
+# LLM review stage is mostly asked to look for (syntax errors, undefined names,
+# missing imports and the deprecated APIs called out in the prompts) and run in
+# milliseconds, so the pipeline can skip the review round-trip for clean code and
+# send only the failing snippets when something is wrong.
+#
+# A diagnostic is a dict: {"line", "end_line", "code", "message"} plus "fix" (the
+# import statement to add) for missing imports.
+
+# Common aliases the generated code uses without importing them
+KNOWN_IMPORTS = {
+    "st": "import streamlit as st",
+    "pd": "import pandas as pd",
+    "np": "import numpy as np",
+    "plt": "import matplotlib.pyplot as plt",
+    "px": "import plotly.express as px",
+    "Image": "from PIL import Image",
+    "ImageDraw": "from PIL import ImageDraw",
+    "ImageFont": "from PIL import ImageFont",
+    "Path": "from pathlib import Path",
+    "BytesIO": "from io import BytesIO",
+    "os": "import os",
+    "io": "import io",
+    "sys": "import sys",
+    "re": "import re",
+    "json": "import json",
+    "base64": "import base64",
+    "glob": "import glob",
+    "math": "import math",
+    "time": "import time",
+    "tempfile": "import tempfile",
+    "zipfile": "import zipfile",
+    "requests": "import requests",
+    "yaml": "import yaml",
+    "librosa": "import librosa",
+    "pandas": "import pandas",
+    "numpy": "import numpy",
+    "PIL": "import PIL",
+}
+
+DEPRECATED_KEYWORDS = {
+    "use_column_width": "st.image(use_column_width=...) is deprecated; use use_container_width=True",
+}
+DEPRECATED_METHODS = {
+    "textsize": "ImageDraw.textsize() was removed from Pillow; use textbbox() or textlength()",
+}
+STYLER_RENDER_MESSAGE = "Styler.render() was removed in pandas; use .to_html()"
+SERIAL_API_MESSAGE = ("API calls inside a loop send the samples one at a time; "
+                      "build the payload list and call run_api_batch(api_url, payloads, progress=...)")
+
+# Names the host injects into the exec namespace (see generated_runtime.build_namespace)
+HOST_NAMES = {"run_api_batch", "dataset_index"}
+_IMPLICIT_NAMES = (set(dir(builtins)) | {"__file__", "__name__", "__doc__", "__builtins__", "__spec__"}
+                   | HOST_NAMES)
+_LOOP_NODES = (ast.For, ast.AsyncFor, ast.While, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def check_code(code):
+    """Run all local checks on generated code and return a list of diagnostics"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        line = e.lineno or 1
+        return [_diagnostic(line, line, "syntax-error", f"SyntaxError: {e.msg}")]
+    diagnostics = _check_names(tree) + _check_deprecated(tree) + _check_serial_api_calls(tree)
+    return sorted(diagnostics, key=lambda d: d["line"])
+
+
+def _diagnostic(line, end_line, code, message, fix=None):
+    diagnostic = {"line": line, "end_line": end_line or line, "code": code, "message": message}
+    if fix:
+        diagnostic["fix"] = fix
+    return diagnostic
+
+
+def _bound_names(tree):
+    """Every name bound anywhere in the module; scopes are ignored to avoid false positives"""
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add(alias.asname or alias.name.split('.')[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            bound.add(node.rest)
+    return bound
+
+
+def _check_names(tree):
+    if any(isinstance(node, ast.ImportFrom) and any(a.name == '*' for a in node.names) for node in ast.walk(tree)):
+        # A star import can bind anything, so name checks would only produce noise
+        return []
+    defined = _bound_names(tree) | _IMPLICIT_NAMES
+    diagnostics = []
+    reported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in defined:
+            if node.id in reported:
+                continue
+            reported.add(node.id)
+            if node.id in KNOWN_IMPORTS:
+                diagnostics.append(_diagnostic(node.lineno, node.end_lineno, "missing-import",
+                                               f"'{node.id}' is used but never imported",
+                                               KNOWN_IMPORTS[node.id]))
+            else:
+                diagnostics.append(_diagnostic(node.lineno, node.end_lineno, "undefined-name",
+                                               f"undefined name '{node.id}'"))
+    return diagnostics
+
+
+def _check_deprecated(tree):
+    diagnostics = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        for keyword in node.keywords:
+            if keyword.arg in DEPRECATED_KEYWORDS:
+                diagnostics.append(_diagnostic(node.lineno, node.end_lineno, "deprecated-api",
+                                               DEPRECATED_KEYWORDS[keyword.arg]))
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            if func.attr in DEPRECATED_METHODS:
+                diagnostics.append(_diagnostic(node.lineno, node.end_lineno, "deprecated-api",
+                                               DEPRECATED_METHODS[func.attr]))
+            elif func.attr == 'render' and _looks_like_styler(func.value):
+                diagnostics.append(_diagnostic(node.lineno, node.end_lineno, "deprecated-api",
+                                               STYLER_RENDER_MESSAGE))
+    return diagnostics
+
+
+def _check_serial_api_calls(tree):
+    """Flag requests.post()/session.post() calls made once per loop iteration"""
+    diagnostics = []
+    reported = set()
+    for loop in ast.walk(tree):
+        if not isinstance(loop, _LOOP_NODES):
+            continue
+        for node in ast.walk(loop):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'post'
+                    and id(node) not in reported):
+                reported.add(id(node))
+                # Span the whole (outermost) loop, so a snippet review can rewrite it
+                diagnostics.append(_diagnostic(loop.lineno, loop.end_lineno, "serial-api-calls", SERIAL_API_MESSAGE))
+    return diagnostics
+
+
+def _looks_like_styler(node):
+    """True for receivers such as df.style..., styled_df or styler"""
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Attribute) and sub.attr == 'style':
+            return True
+        if isinstance(sub, ast.Name) and 'styl' in sub.id.lower():
+            return True
+    return False
+
+
+def fix_missing_imports(code, diagnostics):
+    """Add the imports for missing-import diagnostics locally; returns (code, remaining_diagnostics)"""
+    fixes = []
+    for diagnostic in diagnostics:
+        fix = diagnostic.get("fix")
+        if diagnostic["code"] == "missing-import" and fix and fix not in fixes:
+            fixes.append(fix)
+    if not fixes:
+        return code, diagnostics
+    lines = code.splitlines(True)
+    insert_at = _import_insert_line(code)
+    lines[insert_at:insert_at] = [fix + "\n" for fix in fixes]
+    fixed = ''.join(lines)
+    # Line numbers moved, so re-run the checks on the fixed code
+    return fixed, check_code(fixed)
+
+
+def _import_insert_line(code):
+    """Index of the line after the leading docstring/import block"""
+    tree = ast.parse(code)
+    insert_at = 0
+    for node in tree.body:
+        is_docstring = isinstance(node, ast.Expr) and isinstance(getattr(node, 'value', None), ast.Constant) \
+            and isinstance(node.value.value, str)
+        if isinstance(node, (ast.Import, ast.ImportFrom)) or (is_docstring and insert_at == 0):
+            insert_at = node.end_lineno
+        else:
+            break
+    return insert_at
+
+
+def build_snippets(code, diagnostics, context=3):
+    """Group diagnostics into non-overlapping line ranges of the code.
+
+    Returns [{"start", "end", "text", "diagnostics"}] with 1-based inclusive lines.
+    """
+    lines = code.splitlines(True)
+    ranges = sorted(((max(1, d["line"] - context), min(len(lines), d["end_line"] + context), d) for d in diagnostics),
+                    key=lambda r: (r[0], r[1]))
+    snippets = []
+    for start, end, diagnostic in ranges:
+        if snippets and start <= snippets[-1]["end"] + 1:
+            snippets[-1]["end"] = max(snippets[-1]["end"], end)
+            snippets[-1]["diagnostics"].append(diagnostic)
+        else:
+            snippets.append({"start": start, "end": end, "diagnostics": [diagnostic]})
+    for snippet in snippets:
+        snippet["text"] = ''.join(lines[snippet["start"] - 1:snippet["end"]])
+    return snippets
+
+
+_SNIPPET_REPLY = re.compile(r'SNIPPET\s+(\d+)[^\n]*\n```(?:python)?\n(.*?)```', re.DOTALL)
+
+
+def apply_snippet_fixes(code, snippets, reply):
+    """Splice the corrected snippets from an LLM reply back into code.
+
+    Returns the patched code, or None if the reply could not be matched to the snippets.
+    """
+    fixed = {int(number): text for number, text in _SNIPPET_REPLY.findall(reply)}
+    if not fixed or any(number < 1 or number > len(snippets) for number in fixed):
+        return None
+    lines = code.splitlines(True)
+    # Replace from the bottom up so earlier line numbers stay valid
+    for number in sorted(fixed, reverse=True):
+        snippet = snippets[number - 1]
+        replacement = fixed[number]
+        if replacement and not replacement.endswith('\n'):
+            replacement += '\n'
+        lines[snippet["start"] - 1:snippet["end"]] = [replacement]
+    return ''.join(lines)
+
+
+def format_diagnostics(diagnostics):
+    return '\n'.join(f"- line {d['line']} [{d['code']}]: {d['message']}" for d in diagnostics)
@@ -0,0 +1,143 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import yaml
+
+import file_store
+
+# Library of approved generated apps, keyed by the shape of the task.
+#
+# Bundles often differ only in their endpoint and dataset location. The schema
+# signature of a task.yaml is its sorted model_information.input_format.structure
+# keys plus its output_format.type; an app approved for one task can be reused for
+# any other task with the same signature, either directly (the stored api_url and
+# dataset paths are substituted in the code, no LLM call) or as a reference for
+# the code generation prompt.
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".templates"))
+# Values substituted when a template is instantiated for a new task
+PATH_KEYS = [('model_information', 'api_url'), ('dataset_description', 'data_path'),
+             ('dataset_description', 'data_source')]
+
+
+def schema(task_yaml):
+    """The normalized parts of a task.yaml that decide whether an app can be reused"""
+    model_info = task_yaml.get('model_information') or {}
+    structure = (model_info.get('input_format') or {}).get('structure') or {}
+    output_type = (model_info.get('output_format') or {}).get('type', '')
+    return {
+        "input_keys": sorted(str(key).strip() for key in structure),
+        "output_type": str(output_type).strip().lower(),
+    }
+
+
+def signature(task_yaml):
+    raw = json.dumps(schema(task_yaml), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _values(task_yaml):
+    return {key: (task_yaml.get(section) or {}).get(key) for section, key in PATH_KEYS}
+
+
+def _template_path(sig):
+    return os.path.join(TEMPLATE_DIR, f"{sig}.json")
+
+
+def find(task_yaml):
+    """Return the approved template for task_yaml's signature, or None"""
+    shape = schema(task_yaml)
+    if not shape["input_keys"] and not shape["output_type"]:
+        # Nothing to match on; every malformed task.yaml would look alike
+        return None
+    try:
+        with open(_template_path(signature(task_yaml)), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def approve(task_yaml, code, source=None):
+    """Store code as the template for task_yaml's signature (replacing any previous one)"""
+    sig = signature(task_yaml)
+    record = {
+        "signature": sig,
+        "schema": schema(task_yaml),
+        "values": _values(task_yaml),
+        "code": code,
+        "source": source,
+        "approved_at": time.time(),
+    }
+    file_store.write_json(_template_path(sig), record, ensure_ascii=False, default=str)
+    return sig
+
+
+def remove(sig):
+    try:
+        os.unlink(_template_path(sig))
+        return True
+    except OSError:
+        return False
+
+
+def list_templates():
+    records = []
+    if not os.path.isdir(TEMPLATE_DIR):
+        return records
+    for name in sorted(os.listdir(TEMPLATE_DIR)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(TEMPLATE_DIR, name), 'r', encoding='utf-8') as f:
+                records.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return records
+
+
+def instantiate(template, task_yaml):
+    """Point a template's code at the new task's endpoint and paths.
+
+    Returns None when a value differs but the stored one does not appear in the
+    code, i.e. the app cannot be reused without the LLM. Keys sharing a value
+    (data_path and data_source) are substituted once.
+    """
+    code = template["code"]
+    applied = set()
+    for key, new in _values(task_yaml).items():
+        old = template["values"].get(key)
+        if old == new or (old, new) in applied:
+            continue
+        if not isinstance(old, str) or not isinstance(new, str) or not old or old not in code:
+            return None
+        code = code.replace(old, new)
+        applied.add((old, new))
+    return code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the library of approved generated apps")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="List stored templates")
+    add = sub.add_parser('add', help="Approve a generated app for its task.yaml's schema")
+    add.add_argument('task_yaml', help="task.yaml the app was generated from")
+    add.add_argument('app', help="Generated app (.py)")
+    rm = sub.add_parser('remove', help="Delete a template")
+    rm.add_argument('signature')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for record in list_templates():
+            shape = record["schema"]
+            print(f"{record['signature']}  {shape['output_type'] or '?':10s} {', '.join(shape['input_keys'])}"
+                  f"  (from {record.get('source') or 'unknown'})")
+    elif args.command == 'add':
+        with open(args.task_yaml, 'r', encoding='utf-8') as f:
+            task = yaml.safe_load(f)
+        with open(args.app, 'r', encoding='utf-8') as f:
+            print(f"✅ Stored template {approve(task, f.read(), source=os.path.abspath(args.app))}")
+    elif args.command == 'remove':
+        if not remove(args.signature):
+            raise SystemExit(f"No template {args.signature}")
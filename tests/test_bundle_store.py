@@ -0,0 +1,201 @@
+import os
+import shutil
+import threading
+import zipfile
+
+import pytest
+
+import bundle
+import bundle_store
+
+TASK_YAML = "dataset_description:\n  data_path: ./samples\nmodel_information:\n  api_url: http://model/predict\n"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(bundle_store.BundleStore, "start_reaper", lambda self: None)
+    store = bundle_store.BundleStore(root=str(tmp_path / "store"), max_bytes=10 ** 6, session_quota=10 ** 6)
+    yield store
+    for entry in list(store._entries.values()):
+        bundle.wait_for_extraction(entry["dir"], timeout=10)
+
+
+@pytest.fixture
+def make_zip(tmp_path):
+    """Write a bundle zip (task.yaml plus `samples` files of `size` bytes); returns a factory of spooled copies"""
+    def make(name="bundle", samples=3, size=100):
+        source = tmp_path / f"{name}.zip"
+        if not source.exists():
+            with zipfile.ZipFile(source, "w") as zf:
+                zf.writestr("bundle/task.yaml", TASK_YAML)
+                for i in range(samples):
+                    zf.writestr(f"bundle/samples/{i}.txt", "x" * size)
+        copies = len(list(tmp_path.glob(f"{name}-*.zip")))
+        spooled = tmp_path / f"{name}-{copies}.zip"
+        shutil.copy(source, spooled)
+        return str(spooled)
+
+    return make
+
+
+def test_concurrent_uploads_share_one_ingest(store, make_zip, monkeypatch):
+    ingests = []
+    ingest = store._ingest
+
+    def counting_ingest(entry, *args):
+        ingests.append(entry["hash"])
+        # Give the other sessions time to find the reservation
+        threading.Event().wait(0.1)
+        ingest(entry, *args)
+
+    monkeypatch.setattr(store, "_ingest", counting_ingest)
+    zips = [make_zip() for _ in range(4)]
+    entries = [None] * 4
+
+    def upload(i):
+        entries[i] = store.acquire("hash", f"session-{i}", zips[i])
+
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert ingests == ["hash"]
+    assert all(entry is entries[0] for entry in entries)
+    assert sorted(entries[0]["refs"]) == [f"session-{i}" for i in range(4)]
+    assert entries[0]["files"] == 4
+    bundle.wait_for_extraction(entries[0]["dir"], timeout=10)
+    assert sorted(os.listdir(os.path.join(entries[0]["sample_folder"], "samples"))) == ["0.txt", "1.txt", "2.txt"]
+    assert entries[0]["index"] is not None
+    # Every spooled upload is consumed
+    assert not any(os.path.exists(path) for path in zips)
+
+
+def test_failed_ingest_is_taken_over_by_a_waiting_session(store, make_zip, monkeypatch):
+    ingest = store._ingest
+    attempts = []
+    started = threading.Event()
+
+    def flaky_ingest(entry, *args):
+        attempts.append(entry)
+        if len(attempts) == 1:
+            started.set()
+            threading.Event().wait(0.1)
+            raise OSError("disk full")
+        ingest(entry, *args)
+
+    monkeypatch.setattr(store, "_ingest", flaky_ingest)
+    errors = []
+
+    def first():
+        try:
+            store.acquire("hash", "a", make_zip())
+        except OSError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait(5)
+    entry = store.acquire("hash", "b", make_zip())
+    thread.join(10)
+
+    assert len(errors) == 1
+    assert len(attempts) == 2
+    assert store.get("hash") is entry
+    assert list(entry["refs"]) == ["b"]
+
+
+def test_zip_without_task_yaml(store, tmp_path):
+    path = tmp_path / "empty.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("readme.txt", "no task here")
+    assert store.acquire("hash", "a", str(path)) is None
+    assert not path.exists()
+    assert store.get("hash") is None
+
+
+def test_touch_and_release(store, make_zip):
+    store.acquire("hash", "a", make_zip())
+    assert store.touch("hash", "a")
+    assert not store.touch("hash", "b")
+    store.release("hash", "a")
+    assert not store.touch("hash", "a")
+    # Unreferenced entries stay cached until the store needs the room
+    assert store.get("hash") is not None
+
+
+def test_session_quota(store, make_zip):
+    store.session_quota = 200
+    path = make_zip()
+    with pytest.raises(bundle_store.QuotaError):
+        store.acquire("hash", "a", path)
+    assert not os.path.exists(path)
+    assert store.get("hash") is None
+
+
+def test_store_quota_evicts_idle_bundles_only(store, make_zip):
+    first = store.acquire("first", "a", make_zip("first"))
+    store.max_bytes = first["size"] + 10
+    # Referenced by "a", so there is no room for a second bundle
+    with pytest.raises(bundle_store.QuotaError):
+        store.acquire("second", "b", make_zip("second"))
+    store.release("first", "a")
+    second = store.acquire("second", "b", make_zip("second"))
+    assert store.get("first") is None
+    assert not os.path.exists(first["dir"])
+    assert os.path.isdir(second["dir"])
+    assert store.usage()["reaped"]["evicted"] == 1
+
+
+@pytest.fixture
+def no_temp_orphans(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    monkeypatch.setattr(bundle_store.tempfile, "gettempdir", lambda: str(temp))
+    return temp
+
+
+def test_reap_drops_abandoned_sessions(store, make_zip, no_temp_orphans):
+    entry = store.acquire("hash", "a", make_zip())
+    store.acquire("hash", "b", make_zip())
+    entry["refs"]["a"] -= bundle_store.SESSION_TTL + 1
+    store.max_bytes = 0
+    store.reap()
+    assert list(entry["refs"]) == ["b"]
+    assert store.get("hash") is entry
+    store.reap(now=entry["refs"]["b"] + bundle_store.SESSION_TTL + 1)
+    assert store.get("hash") is None
+    assert store.usage()["reaped"]["sessions"] == 2
+
+
+def test_reap_keeps_other_live_processes_extractions(store, make_zip, no_temp_orphans):
+    other = bundle_store.BundleStore(root=store.base, max_bytes=10 ** 6, session_quota=10 ** 6)
+    theirs = other.acquire("hash", "a", make_zip())
+    bundle.wait_for_extraction(theirs["dir"], timeout=10)
+    store.acquire("mine", "b", make_zip("mine"))
+    much_later = theirs["last_used"] + bundle_store.ORPHAN_TTL + 1
+
+    store.reap(now=much_later)
+    assert os.path.isdir(theirs["dir"])
+
+    # The other process exits: its owner lock is released
+    other._owner_lock.close()
+    store.reap()
+    assert not os.path.exists(other.root)
+    assert store.get("mine") is not None
+    assert os.path.isdir(store.root)
+
+
+def test_reap_leftovers_without_owner_after_ttl(store, make_zip, no_temp_orphans):
+    store.acquire("hash", "a", make_zip())
+    leftover = os.path.join(store.base, "0123abcd")
+    os.makedirs(leftover)
+    upload = no_temp_orphans / (bundle.UPLOAD_PREFIX + "x.zip")
+    upload.write_bytes(b"zip")
+    store.reap()
+    assert os.path.isdir(leftover) and upload.exists()
+    store.reap(now=os.path.getmtime(leftover) + bundle_store.ORPHAN_TTL + 1)
+    assert not os.path.exists(leftover) and not upload.exists()
+    assert os.path.isdir(store.root)
+    assert store.usage()["reaped"]["orphans"] == 2
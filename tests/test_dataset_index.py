@@ -0,0 +1,70 @@
+import os
+
+import dataset_index
+
+SIZES = {
+    "bundle/task.yaml": 10,
+    "bundle/train/cat/1.jpg": 100,
+    "bundle/train/cat/2.jpg": 100,
+    "bundle/train/dog/1.png": 100,
+    "bundle/train/dog0/x.jpg": 50,
+    "bundle/test/a.wav": 200,
+    "bundle/README.txt": 5,
+    "bundle/train/": 0,
+    "other/ignored.jpg": 1,
+}
+
+
+def make_index(root="/data"):
+    return dataset_index.DatasetIndex.from_zip_sizes(SIZES, root, "bundle")
+
+
+def test_from_zip_sizes_keeps_dataset_files_only():
+    index = make_index()
+    assert index.files(absolute=False) == ["README.txt", "test/a.wav", "train/cat/1.jpg", "train/cat/2.jpg",
+                                           "train/dog/1.png", "train/dog0/x.jpg"]
+    assert index.total_size == 555
+
+
+def test_files_by_folder():
+    index = make_index()
+    # train/dog must not pick up train/dog0
+    assert index.files("train/dog", absolute=False) == ["train/dog/1.png"]
+    assert index.files("/train/", absolute=False)[:2] == ["train/cat/1.jpg", "train/cat/2.jpg"]
+    assert index.files("missing") == []
+    assert index.files("train", recursive=False) == []
+    assert index.files(recursive=False, absolute=False) == ["README.txt"]
+
+
+def test_files_filters_and_limit():
+    index = make_index()
+    assert index.files(media_type="audio", absolute=False) == ["test/a.wav"]
+    assert index.files(ext="JPG", absolute=False) == ["train/cat/1.jpg", "train/cat/2.jpg", "train/dog0/x.jpg"]
+    assert index.files(ext=(".png", ".wav"), absolute=False) == ["test/a.wav", "train/dog/1.png"]
+    assert index.files(pattern="train/*/1.*", absolute=False) == ["train/cat/1.jpg", "train/dog/1.png"]
+    assert index.files("train", limit=2, absolute=False) == ["train/cat/1.jpg", "train/cat/2.jpg"]
+    assert index.files("train", ext=".jpg", limit=1) == [os.path.join("/data", "train", "cat", "1.jpg")]
+
+
+def test_classes():
+    index = make_index()
+    assert index.classes("train") == {"cat": 2, "dog": 1, "dog0": 1}
+    assert index.classes() == {"train": 4, "test": 1}
+    assert index.classes("train/cat") == {}
+    assert index.groupings() == {"": {"train": 4, "test": 1}, "train": {"cat": 2, "dog": 1, "dog0": 1}}
+
+
+def test_save_and_load(tmp_path):
+    index = make_index(str(tmp_path / "sample"))
+    path = dataset_index.index_path(str(tmp_path / "sample"))
+    index.save(path)
+    loaded = dataset_index.DatasetIndex.load(path)
+    assert loaded.root == index.root and loaded.paths == index.paths and loaded.sizes == index.sizes
+
+
+def test_from_folder(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "x.jpg").write_bytes(b"123")
+    (tmp_path / "task.yaml").write_text("x: 1")
+    index = dataset_index.DatasetIndex.from_folder(str(tmp_path))
+    assert index.files(absolute=False) == ["a/x.jpg"] and index.sizes == [3]
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import file_store
+
+
+def test_write_json_replaces_atomically(tmp_path):
+    path = str(tmp_path / "records" / "a.json")
+    file_store.write_json(path, {"v": 1})
+    file_store.write_json(path, {"v": 2}, indent=2)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == '{\n  "v": 2\n}'
+
+
+def test_failed_write_leaves_the_old_file_and_no_temp_file(tmp_path):
+    path = str(tmp_path / "a.json")
+    file_store.write_json(path, {"v": 1})
+    with pytest.raises(TypeError):
+        file_store.write_json(path, {"v": object()})
+    assert os.listdir(tmp_path) == ["a.json"]
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == '{"v": 1}'
+
+
+def test_evict_ignores_other_files(tmp_path):
+    for name, age in [("old.json", 300), ("new.json", 10), ("write.tmp", 300)]:
+        path = tmp_path / name
+        path.write_text("x" * 10)
+        os.utime(path, (path.stat().st_mtime - age,) * 2)
+    file_store.evict(str(tmp_path), max_bytes=10)
+    assert sorted(os.listdir(tmp_path)) == ["new.json", "write.tmp"]
+    file_store.evict(str(tmp_path), max_bytes=100, max_age=5)
+    assert os.listdir(tmp_path) == ["write.tmp"]
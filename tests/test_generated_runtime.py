@@ -0,0 +1,68 @@
+import ast
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import generated_runtime  # noqa: E402
+
+CODE = '''
+import json
+from collections import Counter
+
+LOG.append("module")
+counts = Counter()
+
+def main():
+    counts["main"] += 1
+    LOG.append("main")
+
+class Helper:
+    pass
+
+counts["top"] += 1
+'''
+
+
+def names(code_object):
+    return set(code_object.co_names)
+
+
+def test_rerun_code_skips_setup_statements():
+    key, full, rerun = generated_runtime.compile_generated(CODE)
+    assert key == generated_runtime.code_hash(CODE)
+    assert {"json", "Counter", "main", "Helper"} <= names(full)
+    # Imports, function and class definitions only run on the first execution
+    tree = ast.parse(CODE)
+    kept = [node for node in tree.body if not isinstance(node, generated_runtime.SETUP_NODES)]
+    assert [type(node).__name__ for node in kept] == ["Expr", "Assign", "AugAssign"]
+    assert not {"json", "Helper"} & names(rerun)
+    # Compiled once per code hash
+    assert generated_runtime.compile_generated(CODE)[1] is full
+
+
+def test_reruns_keep_the_module_namespace():
+    log = []
+    session = {}
+    elapsed, first_run = generated_runtime.run_generated(CODE, session, extra={"LOG": log})
+    assert first_run
+    namespace = session["generated_namespace"][1]
+    helper = namespace["Helper"]
+    assert log == ["module", "main"]
+
+    _, first_run = generated_runtime.run_generated(CODE, session)
+    assert not first_run
+    assert session["generated_namespace"][1] is namespace
+    # Setup survived; top-level statements ran again (a fresh Counter each time)
+    assert namespace["Helper"] is helper
+    assert log == ["module", "main", "module", "main"]
+    assert namespace["counts"] == {"top": 1, "main": 1}
+
+
+def test_failed_run_starts_over():
+    session = {}
+    with pytest.raises(ZeroDivisionError):
+        generated_runtime.run_generated("x = 1 / 0\n", session)
+    assert "generated_namespace" not in session
+    _, first_run = generated_runtime.run_generated("x = 1\n", session)
+    assert first_run
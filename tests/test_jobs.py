@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+import jobs
+import lineage
+
+
+@pytest.fixture
+def executor():
+    executor = jobs.JobExecutor(max_workers=2)
+    yield executor
+    executor._pool.shutdown(wait=True)
+
+
+def wait_done(job):
+    for _ in range(200):
+        if not job.active:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job {job.id} still {job.status}")
+
+
+def test_same_key_shares_one_run(executor):
+    release = threading.Event()
+    calls = []
+
+    def generate(path, progress=None):
+        calls.append(path)
+        release.wait(5)
+        return "code"
+
+    first = executor.submit("hash", generate, "task.yaml")
+    second = executor.submit("hash", generate, "task.yaml")
+    other = executor.submit("other", generate, "task.yaml")
+    assert second is first
+    assert other is not first
+    release.set()
+    assert wait_done(first).result == "code"
+    wait_done(other)
+    assert len(calls) == 2
+    # A finished job is not joined; the next submission runs again
+    assert executor.submit("hash", generate, "task.yaml") is not first
+
+
+def test_failed_job_skips_callbacks(executor):
+    done = []
+    job = executor.submit("hash", lambda progress=None: None, on_done=done.append)
+    assert wait_done(job).status == 'failed'
+    assert done == []
+
+
+def test_joined_sessions_each_record_their_lineage(executor, tmp_path, monkeypatch):
+    monkeypatch.setattr(lineage, "LINEAGE_DIR", str(tmp_path))
+    task_yaml = {"model_information": {"api_url": "http://model/predict"}}
+    release = threading.Event()
+
+    def generate(task, lineage_name=None, progress=None):
+        # Like main.main, the run saves its result under the starter's lineage only
+        release.wait(5)
+        code = "print('app')\n"
+        lineage.save(lineage_name, task, {"info": 1}, code)
+        return code
+
+    def adopt(name):
+        return lambda code: lineage.adopt(name, task_yaml, code)
+
+    job_a = executor.submit("hash", generate, task_yaml, lineage_name="a:bundle.zip", on_done=adopt("a:bundle.zip"))
+    job_b = executor.submit("hash", generate, task_yaml, lineage_name="b:bundle.zip", on_done=adopt("b:bundle.zip"))
+    assert job_b is job_a
+    release.set()
+    wait_done(job_a)
+
+    record_a, record_b = lineage.load("a:bundle.zip"), lineage.load("b:bundle.zip")
+    assert record_a["code"] == record_b["code"] == "print('app')\n"
+    # The starter's own record is kept as saved by the run
+    assert record_a["extracted_info"] == {"info": 1}
+    assert record_b["extracted_info"] is None
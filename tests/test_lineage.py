@@ -0,0 +1,51 @@
+import lineage
+
+OLD = {
+    "model_information": {"api_url": "http://old/predict", "output_format": {"type": "label"}},
+    "dataset_description": {"data_path": "/data/old", "data_source": "/data/old", "classes": ["a", "b"]},
+}
+NEW = {
+    "model_information": {"api_url": "http://new/predict", "output_format": {"type": "label"}},
+    "dataset_description": {"data_path": "/data/new", "data_source": "/data/new", "classes": ["a", "b", "c"]},
+}
+CODE = 'API_URL = "http://old/predict"\nDATA = "/data/old"\n'
+
+
+def test_diff_lists_leaf_changes():
+    changes = lineage.diff(OLD, NEW)
+    assert [c["path"] for c in changes] == ["model_information.api_url", "dataset_description.data_path",
+                                            "dataset_description.data_source", "dataset_description.classes"]
+    assert changes[0] == {"path": "model_information.api_url", "section": "model_information", "key": "api_url",
+                          "old": "http://old/predict", "new": "http://new/predict"}
+
+
+def test_diff_added_and_removed_keys():
+    changes = lineage.diff({"a": {"x": 1}}, {"a": {"y": 2}})
+    assert [(c["path"], c["old"], c["new"]) for c in changes] == [("a.x", 1, None), ("a.y", None, 2)]
+    assert lineage.diff(OLD, OLD) == []
+
+
+def test_substitute_literals_applies_shared_values_once():
+    changes = [c for c in lineage.diff(OLD, NEW) if c["key"] != "classes"]
+    code, remaining = lineage.substitute_literals(CODE, changes)
+    assert code == 'API_URL = "http://new/predict"\nDATA = "/data/new"\n'
+    assert remaining == []
+
+
+def test_substitute_literals_leaves_other_changes():
+    code, remaining = lineage.substitute_literals(CODE, lineage.diff(OLD, NEW))
+    assert [c["key"] for c in remaining] == ["classes"]
+    # A path the code does not contain cannot be substituted either
+    _, remaining = lineage.substitute_literals("x = 1\n", lineage.diff(OLD, NEW)[:1])
+    assert [c["key"] for c in remaining] == ["api_url"]
+
+
+def test_apply_search_replace():
+    reply = ("<<<<<<< SEARCH\nDATA = \"/data/old\"\n=======\nDATA = \"/data/old\"\nLIMIT = 10\n>>>>>>> REPLACE\n")
+    assert lineage.apply_search_replace(CODE, reply) == CODE + "LIMIT = 10\n"
+
+
+def test_apply_search_replace_rejects_mismatches():
+    assert lineage.apply_search_replace(CODE, "no blocks") is None
+    assert lineage.apply_search_replace(CODE, "<<<<<<< SEARCH\nmissing\n=======\nx\n>>>>>>> REPLACE") is None
+    assert lineage.apply_search_replace(CODE, None) is None
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+import llm_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def age(key, seconds):
+    """Make an entry look last used `seconds` ago"""
+    path = llm_cache._entry_path(key)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_round_trip_and_key_stability(cache):
+    key = llm_cache.make_key("extract", "prompt", "model", {"temperature": 0}, {"b": 1, "a": 2})
+    assert key == llm_cache.make_key("extract", "prompt", "model", {"temperature": 0}, {"a": 2, "b": 1})
+    assert key != llm_cache.make_key("generate", "prompt", "model", {"temperature": 0}, {"a": 2, "b": 1})
+    assert llm_cache.get(key) is None
+    llm_cache.put(key, "reply", stage="extract")
+    assert llm_cache.get(key) == "reply"
+    assert [name for name in os.listdir(cache) if name.endswith(".tmp")] == []
+
+
+def test_expired_entries_are_dropped(cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_AGE", 60)
+    llm_cache.put("old", "a")
+    llm_cache.put("new", "b")
+    age("old", 120)
+    llm_cache.evict()
+    assert sorted(os.listdir(cache)) == ["new.json"]
+
+    # An entry created too long ago is a miss even when it was touched recently
+    monkeypatch.setattr(llm_cache.time, "time", lambda: os.stat(llm_cache._entry_path("new")).st_mtime + 61)
+    assert llm_cache.get("new") is None
+    assert os.listdir(cache) == []
+
+
+def test_least_recently_used_entries_go_first(cache, monkeypatch):
+    for key, seconds in [("a", 30), ("b", 20), ("c", 10)]:
+        llm_cache.put(key, "x" * 100)
+        age(key, seconds)
+    # Reading "a" makes it the most recently used
+    assert llm_cache.get("a") == "x" * 100
+    entry_size = max(os.path.getsize(llm_cache._entry_path(key)) for key in "abc")
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_BYTES", 2 * entry_size)
+    llm_cache.evict()
+    assert sorted(os.listdir(cache)) == ["a.json", "c.json"]
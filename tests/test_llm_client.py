@@ -0,0 +1,215 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class FakeClock:
+    """Stands in for the time module; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeStream:
+    """SDK stream: iterates over chunks, advancing the clock by `interval` per chunk"""
+
+    def __init__(self, chunks, clock, interval=0.0, error=None):
+        self.chunks = chunks
+        self.clock = clock
+        self.interval = interval
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.clock.now += self.interval
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_client, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """LLMClient over fake openai/httpx modules; create() answers the SDK calls"""
+    openai = SimpleNamespace(APIStatusError=APIStatusError, APITimeoutError=APITimeoutError,
+                             APIConnectionError=APIConnectionError)
+    httpx = SimpleNamespace(Client=lambda **kwargs: None, Limits=lambda **kwargs: None)
+    monkeypatch.setattr(llm_client.lazy_modules, "import_timed", {"openai": openai, "httpx": httpx}.__getitem__)
+
+    def make(create, **settings):
+        openai.OpenAI = lambda **kwargs: SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return llm_client.LLMClient(**settings)
+
+    return make
+
+
+def test_stream_deadline_covers_the_whole_stream(make_client, clock):
+    response = FakeStream(["a", "b", "c", "d"], clock, interval=4.0)
+    client = make_client(lambda **kwargs: response, deadline=10.0)
+    received = []
+    with pytest.raises(llm_client.LLMError, match="deadline"):
+        for chunk in client.stream("model", [], {}):
+            received.append(chunk)
+    assert received == ["a", "b"]
+    assert response.closed
+
+
+def test_stream_closes_discarded_attempts(make_client, clock):
+    responses = [FakeStream([], clock, error=APIConnectionError("reset")), FakeStream(["a", "b"], clock)]
+    pending = iter(responses)
+    client = make_client(lambda **kwargs: next(pending))
+    meta = {}
+    assert list(client.stream("model", [], {}, meta=meta)) == ["a", "b"]
+    assert meta["retries"] == 1
+    assert responses[0].closed and responses[1].closed
+
+
+def test_stream_error_after_first_chunk_is_not_retried(make_client, clock):
+    response = FakeStream(["a"], clock, error=APIConnectionError("reset"))
+    client = make_client(lambda **kwargs: response)
+    with pytest.raises(llm_client.LLMError, match="stream interrupted"):
+        list(client.stream("model", [], {}))
+    assert response.closed
+
+
+def test_throttle_runs_before_every_attempt(make_client, clock):
+    throttled = []
+    replies = iter([APIStatusError(503), "reply"])
+
+    def create(**kwargs):
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    client = make_client(create)
+    assert client.complete("model", [], {}, throttle=lambda: throttled.append("complete")) == "reply"
+    responses = iter([FakeStream([], clock, error=APITimeoutError()), FakeStream(["a"], clock)])
+    client = make_client(lambda **kwargs: next(responses))
+    assert list(client.stream("model", [], {}, throttle=lambda: throttled.append("stream"))) == ["a"]
+    assert throttled == ["complete", "complete", "stream", "stream"]
+
+
+def failing(*errors, reply="reply"):
+    """create() raising the given errors in turn, then answering reply"""
+    pending = list(errors)
+
+    def create(**kwargs):
+        if pending:
+            raise pending.pop(0)
+        return reply
+
+    return create
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+
+
+def test_backoff_doubles_up_to_the_cap(make_client, clock, no_jitter):
+    client = make_client(failing(APIStatusError(503), APITimeoutError(), APIConnectionError("reset")),
+                         backoff_base=0.5, backoff_max=1.5)
+    meta = {}
+    assert client.complete("model", [], {}, meta=meta) == "reply"
+    assert clock.slept == [0.5, 1.0, 1.5]
+    assert meta["retries"] == 3
+
+
+def test_retry_after_headers(make_client, clock, no_jitter):
+    client = make_client(failing(APIStatusError(429, {"retry-after": "7"}),
+                                 APIStatusError(429, {"retry-after-ms": "1500"})))
+    client.complete("model", [], {})
+    assert clock.slept == [7.0, 1.5]
+
+
+def test_retry_after_past_the_deadline_gives_up(make_client, clock):
+    client = make_client(failing(APIStatusError(429, {"retry-after": "60"})), deadline=10.0)
+    with pytest.raises(llm_client.LLMError, match="no time left") as error:
+        client.complete("model", [], {})
+    assert error.value.attempts == 1
+    assert clock.slept == []
+
+
+def test_non_retryable_and_exhausted_errors(make_client, clock, no_jitter):
+    client = make_client(failing(APIStatusError(400)))
+    with pytest.raises(llm_client.LLMError) as error:
+        client.complete("model", [], {})
+    assert error.value.attempts == 1
+    assert clock.slept == []
+
+    client = make_client(failing(*[APIStatusError(500)] * 3), max_retries=2)
+    with pytest.raises(llm_client.LLMError) as error:
+        client.complete("model", [], {})
+    assert error.value.attempts == 3
+    assert len(clock.slept) == 2
+
+
+def test_slow_attempt_is_hedged(make_client):
+    release = threading.Event()
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["timeout"])
+        if len(calls) == 1:
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    client = make_client(create, hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        client.latencies.add(0.05)
+    throttled = []
+    meta = {}
+    try:
+        assert client.complete("model", [], {}, meta=meta, throttle=lambda: throttled.append(1)) == "fast"
+    finally:
+        release.set()
+    assert meta["hedged"] is True
+    assert len(calls) == 2 and len(throttled) == 2
+
+
+def test_fast_attempt_is_not_hedged(make_client):
+    client = make_client(failing(), hedge=True, hedge_min_samples=3)
+    for _ in range(3):
+        client.latencies.add(5.0)
+    meta = {}
+    assert client.complete("model", [], {}, meta=meta) == "reply"
+    assert meta["hedged"] is False
@@ -0,0 +1,35 @@
+import prompt_budget
+
+TASK = {
+    "model_information": {
+        "api_url": "http://example.com/" + "v" * 300,
+        "input_format": {"structure": {f"field{i}": "str" for i in range(12)}},
+        "output_format": {"type": "classification"},
+    },
+    "labels": [f"label{i}" for i in range(200)],
+    "notes": {f"note{i}": "long text " * 50 for i in range(30)},
+    **{f"extra{i}": i for i in range(8)},
+    "dataset_description": {"data_path": "/data/" + "p" * 200, "data_source": "/data/" + "p" * 200},
+}
+
+
+def test_fit_yaml_unchanged_within_budget():
+    text, tokens, level = prompt_budget.fit_yaml(TASK)
+    assert level == 0 and tokens == prompt_budget.count_tokens(text)
+
+
+def test_fit_yaml_keeps_every_top_level_section():
+    text, _, level = prompt_budget.fit_yaml(TASK, 60)
+    assert level == len(prompt_budget.COMPACTION_LEVELS) - 1
+    compacted = prompt_budget.compact(TASK, *prompt_budget.COMPACTION_LEVELS[-1])
+    assert list(compacted) == list(TASK)
+    assert "more entries omitted" not in text.splitlines()[-1]
+
+
+def test_compact_protects_required_fields():
+    compacted = prompt_budget.compact(TASK, 3, 60)
+    assert compacted["model_information"]["api_url"] == TASK["model_information"]["api_url"]
+    assert compacted["dataset_description"] == TASK["dataset_description"]
+    assert list(compacted["model_information"]["input_format"]["structure"]) == [f"field{i}" for i in range(12)]
+    assert len(compacted["labels"]) == 4 and compacted["labels"][-1] == "label199"
+    assert len(compacted["notes"]) == 4 and compacted["notes"]["note0"].endswith("(truncated)")
@@ -0,0 +1,55 @@
+import pytest
+
+import rate_limit
+
+
+class FakeClock:
+    """Stands in for the time module; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_requests_per_minute(clock):
+    limiter = rate_limit.RateLimiter(requests_per_minute=60)
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.slept == []
+    limiter.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_tokens_per_minute(clock):
+    limiter = rate_limit.RateLimiter(tokens_per_minute=600)
+    limiter.acquire(500)
+    limiter.acquire(400)
+    # 300 tokens were missing and the bucket refills at 10 per second
+    assert sum(clock.slept) == pytest.approx(30.0)
+
+
+def test_oversized_request_is_capped(clock):
+    limiter = rate_limit.RateLimiter(tokens_per_minute=100)
+    limiter.acquire(10_000)
+    assert clock.slept == []
+
+
+def test_no_limits_never_waits(clock):
+    limiter = rate_limit.RateLimiter()
+    for _ in range(1000):
+        limiter.acquire(10_000)
+    assert clock.slept == []
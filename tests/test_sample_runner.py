@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+import pytest
+
+import sample_runner
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.ok = status_code < 400
+        self.text = str(body)
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class FakeSession:
+    """Answers {"echo": payload["n"]}; later payloads answer sooner"""
+
+    def __init__(self, fail=()):
+        self.posts = []
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        with self._lock:
+            self.posts.append(json["n"])
+        time.sleep(0.01 * (5 - json["n"] % 5))
+        if json["n"] in self.fail:
+            return FakeResponse(500, {"error": "boom"})
+        return FakeResponse(200, {"echo": json["n"]})
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    session = FakeSession(fail={3})
+    monkeypatch.setattr(sample_runner, "SAMPLE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(sample_runner, "get_session", lambda: session)
+    return session
+
+
+def test_results_keep_input_order(session):
+    calls = []
+    caller = threading.current_thread()
+
+    def progress(done, total):
+        assert threading.current_thread() is caller
+        calls.append((done, total))
+
+    results = sample_runner.run_api_batch("http://model/predict", [{"n": n} for n in range(5)],
+                                          progress=progress, max_workers=5)
+    assert [r["json"] for r in results] == [{"echo": 0}, {"echo": 1}, {"echo": 2}, {"error": "boom"}, {"echo": 4}]
+    assert [r["ok"] for r in results] == [True, True, True, False, True]
+    assert results[3]["error"] == "HTTP 500"
+    assert calls == [(done, 5) for done in range(1, 6)]
+
+
+def test_successful_responses_are_cached(session):
+    payloads = [{"n": n} for n in range(5)]
+    sample_runner.run_api_batch("http://model/predict", payloads)
+    assert sorted(session.posts) == [0, 1, 2, 3, 4]
+
+    session.posts.clear()
+    results = sample_runner.run_api_batch("http://model/predict", payloads)
+    # Only the failed payload is sent again
+    assert session.posts == [3]
+    assert [r["cached"] for r in results] == [True, True, True, False, True]
+    assert results[1]["json"] == {"echo": 1} and results[1]["status_code"] == 200
+
+    # The cache is keyed by endpoint too, and can be bypassed
+    session.posts.clear()
+    sample_runner.run_api_batch("http://other/predict", payloads[:1])
+    sample_runner.run_api_batch("http://model/predict", payloads[:1], use_cache=False)
+    assert session.posts == [0, 0]
+
+
+def test_cache_is_bounded(session, tmp_path, monkeypatch):
+    sample_runner.run_api_batch("http://model/predict", [{"n": 0}])
+    entry_size = os.path.getsize(sample_runner._entry_path(sample_runner.make_key("http://model/predict", {"n": 0})))
+    monkeypatch.setattr(sample_runner, "SAMPLE_CACHE_MAX_BYTES", 2 * entry_size)
+    sample_runner.run_api_batch("http://model/predict", [{"n": n} for n in (1, 2, 4)])
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".json")]) == 2
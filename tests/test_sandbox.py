@@ -0,0 +1,44 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import sandbox
+
+
+def _hang():
+    time.sleep(60)
+
+
+def _pid():
+    return multiprocessing.current_process().pid
+
+
+def test_expired_test_kills_its_pool(monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    monkeypatch.setattr(sandbox, "_pool", pool)
+    pool.submit(_pid).result(30)
+    workers = list(pool._processes.values())
+    future = pool.submit(_hang)
+    sandbox._owners[future] = pool
+
+    outcome = sandbox.expire(future)
+
+    assert outcome == {"ok": False, "error": "smoke test timed out", "elapsed": None}
+    assert sandbox._pool is None
+    for process in workers:
+        process.join(5)
+        assert not process.is_alive()
+
+
+def test_lost_test_is_reported_as_crashed(monkeypatch):
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    monkeypatch.setattr(sandbox, "_pool", pool)
+    hung = pool.submit(_hang)
+    queued = pool.submit(_pid)
+    sandbox._owners[hung] = sandbox._owners[queued] = pool
+
+    sandbox.expire(hung)
+    outcome = sandbox.result(queued, timeout=5)
+
+    assert outcome["ok"] is False
+    assert outcome["crashed"] is True
@@ -0,0 +1,76 @@
+import static_check
+
+
+def codes(diagnostics):
+    return [d["code"] for d in diagnostics]
+
+
+def test_clean_code_has_no_diagnostics():
+    code = "import streamlit as st\n\ndef main():\n    st.title('x')\n\nmain()\n"
+    assert static_check.check_code(code) == []
+
+
+def test_syntax_error():
+    assert codes(static_check.check_code("def broken(:\n    pass\n")) == ["syntax-error"]
+
+
+def test_missing_import_and_undefined_name():
+    diagnostics = static_check.check_code("df = pd.DataFrame()\nprint(mystery)\n")
+    assert codes(diagnostics) == ["missing-import", "undefined-name"]
+    assert diagnostics[0]["fix"] == "import pandas as pd"
+
+
+def test_host_names_are_defined():
+    code = "results = run_api_batch('http://x', [{}])\nfiles = dataset_index.files()\n"
+    assert static_check.check_code(code) == []
+
+
+def test_deprecated_apis():
+    code = ("import streamlit as st\n"
+            "df = draw = None\n"
+            "st.image('a.png', use_column_width=True)\n"
+            "html = df.style.render()\n"
+            "width = draw.textsize('x')\n")
+    assert codes(static_check.check_code(code)) == ["deprecated-api"] * 3
+
+
+def test_serial_api_calls_span_the_loop():
+    code = ("import requests\n"
+            "for sample in samples:\n"
+            "    requests.post(url, json=sample)\n")
+    diagnostics = [d for d in static_check.check_code(code) if d["code"] == "serial-api-calls"]
+    assert [(d["line"], d["end_line"]) for d in diagnostics] == [(2, 3)]
+
+
+def test_fix_missing_imports_inserts_after_import_block():
+    code = '"""App"""\nimport streamlit as st\n\ndf = pd.DataFrame()\nst.write(df)\n'
+    fixed, remaining = static_check.fix_missing_imports(code, static_check.check_code(code))
+    assert remaining == []
+    assert fixed.splitlines()[:3] == ['"""App"""', "import streamlit as st", "import pandas as pd"]
+
+
+def test_fix_missing_imports_keeps_other_diagnostics():
+    code = "x = np.zeros(3)\nprint(mystery)\n"
+    fixed, remaining = static_check.fix_missing_imports(code, static_check.check_code(code))
+    assert fixed.startswith("import numpy as np\n")
+    assert codes(remaining) == ["undefined-name"]
+
+
+def test_apply_snippet_fixes():
+    code = "".join(f"line{i} = {i}\n" for i in range(1, 21))
+    diagnostics = [static_check._diagnostic(5, 5, "undefined-name", "x"),
+                   static_check._diagnostic(16, 16, "undefined-name", "y")]
+    snippets = static_check.build_snippets(code, diagnostics, context=1)
+    assert [(s["start"], s["end"]) for s in snippets] == [(4, 6), (15, 17)]
+    reply = "SNIPPET 2\n```python\nfixed = 16\n```\nSNIPPET 1\n```python\nfixed = 5\n```\n"
+    patched = static_check.apply_snippet_fixes(code, snippets, reply).splitlines()
+    assert patched[:5] == ["line1 = 1", "line2 = 2", "line3 = 3", "fixed = 5", "line7 = 7"]
+    assert "fixed = 16" in patched and "line15 = 15" not in patched
+    assert len(patched) == 20 - 6 + 2
+
+
+def test_apply_snippet_fixes_rejects_unknown_snippets():
+    code = "a = 1\n"
+    snippets = static_check.build_snippets(code, [static_check._diagnostic(1, 1, "undefined-name", "x")])
+    assert static_check.apply_snippet_fixes(code, snippets, "no snippets here") is None
+    assert static_check.apply_snippet_fixes(code, snippets, "SNIPPET 3\n```python\nb = 2\n```") is None
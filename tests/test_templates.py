@@ -0,0 +1,49 @@
+import pytest
+
+import templates
+
+
+def task(api_url, folder, output_type="label", keys=("image",)):
+    return {
+        "model_information": {"api_url": api_url, "input_format": {"structure": {k: "str" for k in keys}},
+                              "output_format": {"type": output_type}},
+        "dataset_description": {"data_path": folder, "data_source": folder},
+    }
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(templates, "TEMPLATE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_signature_depends_on_shape_only():
+    assert templates.signature(task("http://a", "/x")) == templates.signature(task("http://b", "/y"))
+    assert templates.signature(task("http://a", "/x")) != templates.signature(task("http://a", "/x", "boxes"))
+    assert templates.signature(task("http://a", "/x", keys=("b", "a"))) == templates.signature(
+        task("http://a", "/x", keys=("a", "b")))
+
+
+def test_instantiate_substitutes_shared_paths():
+    template = {"code": 'URL = "http://a"\nROOT = "/x"\n', "values": templates._values(task("http://a", "/x"))}
+    assert templates.instantiate(template, task("http://b", "/y")) == 'URL = "http://b"\nROOT = "/y"\n'
+    assert templates.instantiate(template, task("http://a", "/x")) == template["code"]
+
+
+def test_instantiate_refuses_values_missing_from_code():
+    template = {"code": 'URL = "http://a"\n', "values": templates._values(task("http://a", "/x"))}
+    assert templates.instantiate(template, task("http://b", "/y")) is None
+
+
+def test_approve_find_remove(template_dir):
+    sig = templates.approve(task("http://a", "/x"), "code", source="a.zip")
+    assert templates.find(task("http://b", "/y"))["code"] == "code"
+    assert templates.find(task("http://b", "/y", "boxes")) is None
+    assert [t["signature"] for t in templates.list_templates()] == [sig]
+    assert templates.remove(sig) and not templates.remove(sig)
+    assert templates.find(task("http://a", "/x")) is None
+
+
+def test_find_ignores_tasks_without_a_shape(template_dir):
+    templates.approve({}, "code")
+    assert templates.find({}) is None
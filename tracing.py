@@ -0,0 +1,202 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Structured instrumentation for the generation pipeline.
+#
+# main.main opens one trace per run; pipeline stages and LLM calls are recorded
+# into the trace of the current context (a contextvar, so concurrent batch
+# workers never mix their traces). Finished traces are appended to a JSON-lines
+# file and folded into Prometheus-style counters, which can optionally be written
+# to a textfile for node_exporter's textfile collector.
+TRACE_PATH = os.getenv("TRACE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl"))
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE")
+
+# USD per million (prompt, completion) tokens, used for cost estimates
+MODEL_PRICES = {
+    "gpt-4.1-nano-2025-04-14": (0.10, 0.40),
+    "gpt-4.1-mini-2025-04-14": (0.40, 1.60),
+    "gpt-4.1-2025-04-14": (2.00, 8.00),
+}
+
+_current = contextvars.ContextVar("current_trace", default=None)
+# When set, set_attribute() writes here instead of the trace (see scoped_attributes)
+_attribute_scope = contextvars.ContextVar("attribute_scope", default=None)
+_write_lock = threading.Lock()
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+class Trace:
+    """Everything measured during one pipeline run"""
+
+    def __init__(self, task, model):
+        self.data = {
+            "trace_id": uuid.uuid4().hex,
+            "task": task,
+            "model": model,
+            "started_at": time.time(),
+            "stages": {},
+            "llm_calls": [],
+            "review_outcome": None,
+        }
+        self._start = time.perf_counter()
+
+    def finish(self, status):
+        data = self.data
+        # A status set explicitly during the run (e.g. 'failed') wins
+        data["status"] = data.get("status") or status
+        data["wall_time"] = time.perf_counter() - self._start
+        calls = data["llm_calls"]
+        data["totals"] = {
+            "llm_calls": sum(1 for c in calls if not c["cached"]),
+            "cache_hits": sum(1 for c in calls if c["cached"]),
+            "retries": sum(c.get("retries", 0) for c in calls),
+            "prompt_tokens": sum(c.get("prompt_tokens", 0) for c in calls),
+            "completion_tokens": sum(c.get("completion_tokens", 0) for c in calls),
+            "cost_usd": round(sum(c.get("cost_usd", 0.0) for c in calls), 6),
+        }
+        _export(data)
+        return data
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one call, or 0.0 for unknown models"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+@contextmanager
+def trace_run(task, model):
+    """Open a trace for one pipeline run; yields the Trace"""
+    trace = Trace(task, model)
+    token = _current.set(trace)
+    status = 'error'
+    try:
+        yield trace
+        status = 'ok'
+    finally:
+        _current.reset(token)
+        trace.finish(status)
+
+
+@contextmanager
+def stage(name):
+    """Time one pipeline stage in the current trace (no-op without one)"""
+    trace = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.data["stages"][name] = {"wall_time": time.perf_counter() - start}
+
+
+def record_llm_call(stage_name, wall_time=0.0, ttft=None, usage=None, cached=False, retries=0, ok=True):
+    """Add one LLM call (or cache hit) to the current trace"""
+    trace = _current.get()
+    if trace is None:
+        return
+    call = {"stage": stage_name, "cached": cached, "ok": ok, "wall_time": wall_time, "ttft": ttft, "retries": retries}
+    if usage:
+        call["prompt_tokens"] = usage.get("prompt_tokens", 0)
+        call["completion_tokens"] = usage.get("completion_tokens", 0)
+        call["tokens_estimated"] = bool(usage.get("estimated"))
+        call["finish_reason"] = usage.get("finish_reason")
+        call["hedged"] = bool(usage.get("hedged"))
+        call["cost_usd"] = estimate_cost(trace.data["model"], call["prompt_tokens"], call["completion_tokens"])
+    trace.data["llm_calls"].append(call)
+
+
+def set_attribute(key, value):
+    """Set a top-level field (e.g. review_outcome) on the current trace"""
+    scope = _attribute_scope.get()
+    if scope is not None:
+        scope[key] = value
+        return
+    trace = _current.get()
+    if trace is not None:
+        trace.data[key] = value
+
+
+@contextmanager
+def scoped_attributes(target):
+    """Collect set_attribute() calls of this context in the dict target instead of the trace.
+
+    Used by work running in parallel within one trace (e.g. candidate
+    generations), whose attributes would otherwise overwrite each other.
+    """
+    token = _attribute_scope.set(target)
+    try:
+        yield target
+    finally:
+        _attribute_scope.reset(token)
+
+
+def _export(data):
+    if TRACE_PATH:
+        line = json.dumps(data, default=str)
+        with _write_lock:
+            try:
+                with open(TRACE_PATH, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not write trace: {e}")
+    _update_counters(data)
+    if PROMETHEUS_TEXTFILE:
+        tmp_path = PROMETHEUS_TEXTFILE + '.tmp'
+        with _write_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(render_prometheus())
+                os.replace(tmp_path, PROMETHEUS_TEXTFILE)
+            except OSError as e:
+                print(f"⚠️ Could not write metrics: {e}")
+
+
+def _inc(name, labels, amount=1.0):
+    key = (name, tuple(sorted(labels.items())))
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0.0) + amount
+
+
+def _update_counters(data):
+    _inc("pipeline_runs_total", {"status": data["status"]})
+    _inc("pipeline_seconds_total", {}, data["wall_time"])
+    for name, stage_data in data["stages"].items():
+        _inc("pipeline_stage_seconds_total", {"stage": name}, stage_data["wall_time"])
+        _inc("pipeline_stage_runs_total", {"stage": name})
+    for call in data["llm_calls"]:
+        labels = {"stage": call["stage"]}
+        if call["cached"]:
+            _inc("llm_cache_hits_total", labels)
+            continue
+        _inc("llm_calls_total", dict(labels, ok=str(call["ok"]).lower()))
+        _inc("llm_retries_total", labels, call.get("retries", 0))
+        if call.get("hedged"):
+            _inc("llm_hedged_calls_total", labels)
+        _inc("llm_call_seconds_total", labels, call["wall_time"])
+        _inc("llm_prompt_tokens_total", labels, call.get("prompt_tokens", 0))
+        _inc("llm_completion_tokens_total", labels, call.get("completion_tokens", 0))
+        _inc("llm_cost_usd_total", labels, call.get("cost_usd", 0.0))
+    if data.get("review_outcome"):
+        _inc("review_outcomes_total", {"outcome": data["review_outcome"]})
+
+
+def render_prometheus():
+    """Current counters in the Prometheus text exposition format"""
+    with _counters_lock:
+        items = sorted(_counters.items())
+    lines = []
+    seen = set()
+    for (name, labels), value in items:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} counter")
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"